@@ -0,0 +1,255 @@
+"""
+Async versions of the hot read endpoints, for a deployment on an ASGI
+server.
+
+DRF 3.14 only has sync views, so these are plain Django async views that
+api.urls routes in front of the viewsets when ASYNC_READ_VIEWS is on. They
+run the viewsets' own querysets, filters, caches and serializers, and read
+the database with the async ORM. Everything they do not cover -- other
+methods, the browsable API, cursor pages, invalid tokens and error
+responses -- is handed over to the sync view of the same route, so the
+responses stay the same.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from recipes.models import Recipe
+
+from .cache import cart_ids, favorite_ids, subscribed_ids
+from .constants import (CURSOR_PAGINATION, PAGINATION_QUERY_PARAM,
+                        SHOPPING_LIST_CHUNK_SIZE,
+                        SHOPPING_LIST_DEFAULT_FORMAT, SHOPPING_LIST_FILENAME,
+                        SHOPPING_LIST_FORMAT_PARAM)
+from .exports import EXPORT_FORMATS, shopping_list_items
+from .serializers import RecipeGetSerializer
+from .utils import set_recipe_flags
+from .views import RecipeViewSet
+
+# Keyword of the Authorization header of TokenAuthentication
+TOKEN_KEYWORD = 'token'
+
+# Requests of the process that may hold a database connection at once
+connection_slots = asyncio.Semaphore(settings.ASYNC_READ_VIEWS_CONNECTIONS)
+
+
+@asynccontextmanager
+async def database_connection():
+    """
+    Take one of the connection slots for the block and close the database
+    connection of the request at its end.
+
+    Under ASGI the sync code of every request, the async ORM included,
+    runs in a thread of its own, so each request opens a connection that
+    no other request can reuse. The slots keep their number within
+    max_connections of PostgreSQL however many clients are waiting.
+    """
+    async with connection_slots:
+        try:
+            yield
+        finally:
+            await sync_to_async(connections.close_all)()
+
+
+async def authenticate(request):
+    """
+    Return the user of the token in the Authorization header, an
+    AnonymousUser without one and None when the token is invalid.
+    """
+    header = request.headers.get('Authorization', '').split()
+    if not header or header[0].lower() != TOKEN_KEYWORD:
+        return AnonymousUser()
+    if len(header) != 2:
+        return None
+    try:
+        token = await (Token.objects.select_related('user')
+                       .aget(key=header[1]))
+    except Token.DoesNotExist:
+        return None
+    return token.user if token.user.is_active else None
+
+
+async def paginate(paginator, queryset, request) -> list:
+    """
+    Async paginate_queryset() of a PageNumberPagination: the page is
+    counted and read with the async ORM.
+    """
+    page_size = paginator.get_page_size(request)
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        page = django_paginator.page(page_number)
+    except InvalidPage:
+        raise NotFound()
+    page.object_list = [obj async for obj in
+                        page.object_list.aiterator(chunk_size=page_size)]
+    paginator.page = page
+    paginator.request = request
+    return page.object_list
+
+
+class AsyncReadView(View):
+    """
+    GET of a route served asynchronously, with sync_view, the view of the
+    router, serving everything else.
+
+    get() returns a response or None to hand the request over.
+    """
+    sync_view = None
+    viewset_class = None
+    action: str = None
+
+    async def get(self, request: Request, **kwargs):
+        return None
+
+    def make_viewset(self, request: Request, **kwargs):
+        return self.viewset_class(request=request, args=(), kwargs=kwargs,
+                                  format_kwarg=None, action=self.action)
+
+    @staticmethod
+    def accepts_json(request) -> bool:
+        return ('text/html' not in request.headers.get('Accept', '')
+                and 'format' not in request.GET)
+
+    async def dispatch(self, request, *args, **kwargs):
+        async with database_connection():
+            response = None
+            if request.method == 'GET' and self.accepts_json(request):
+                user = await authenticate(request)
+                if user is not None:
+                    drf_request = Request(request)
+                    drf_request.user = user
+                    try:
+                        response = await self.get(drf_request, **kwargs)
+                    except APIException:
+                        # The sync view builds the error response
+                        response = None
+            if response is None:
+                return await sync_to_async(self.sync_view)(request, *args,
+                                                           **kwargs)
+        if isinstance(response, Response):
+            response = self.render(response)
+        return response
+
+    @staticmethod
+    def render(response: Response) -> HttpResponse:
+        """
+        Render a DRF Response as the sync view would, into a plain
+        HttpResponse: the ASGI handler would otherwise render it in a
+        thread.
+        """
+        renderer = JSONRenderer()
+        rendered = HttpResponse(renderer.render(response.data),
+                                status=response.status_code,
+                                content_type=renderer.media_type)
+        # Response has a default Content-Type of its own
+        for name, value in response.items():
+            if name.lower() != 'content-type':
+                rendered[name] = value
+        patch_vary_headers(rendered, ['Accept'])
+        return rendered
+
+
+class AsyncCatalogueView(AsyncReadView):
+    """List or detail of a CachedCatalogueMixin viewset."""
+
+    async def get(self, request, **kwargs):
+        viewset = self.make_viewset(request, **kwargs)
+        entry = await viewset.catalogue.aget()
+        if self.action == 'list':
+            return viewset.catalogue_list(request, entry)
+        return viewset.catalogue_detail(request, entry)
+
+
+class AsyncRecipeListView(AsyncReadView):
+    viewset_class = RecipeViewSet
+    action = 'list'
+
+    async def build_page(self, viewset, request) -> dict:
+        """Page of the recipes with the flags of the requesting user."""
+        # The filters may validate the author and the tag slugs against
+        # the database, which the sync ORM does in a thread
+        queryset = await sync_to_async(viewset.filter_queryset)(
+            viewset.get_queryset())
+        page = await paginate(viewset.paginator, queryset, request)
+        context = viewset.get_serializer_context()
+        if request.user.is_authenticated:
+            context['subscribed_ids'] = await subscribed_ids.aget(
+                request.user.id)
+        serializer = RecipeGetSerializer(page, many=True, context=context)
+        return viewset.paginator.get_paginated_response(serializer.data).data
+
+    async def get(self, request, **kwargs):
+        if (request.query_params.get(PAGINATION_QUERY_PARAM)
+                == CURSOR_PAGINATION):
+            return None
+        viewset = self.make_viewset(request, **kwargs)
+        if not viewset.feed_cache.accepts(request):
+            return Response(await self.build_page(viewset, request))
+
+        async def compute():
+            return viewset.overlay_feed(
+                await self.build_page(viewset, request), None)
+
+        data = await viewset.feed_cache.aget_or_set(request, compute)
+        user = request.user
+        if user.is_authenticated:
+            set_recipe_flags(data['results'],
+                             await favorite_ids.aget(user.id),
+                             await cart_ids.aget(user.id),
+                             await subscribed_ids.aget(user.id))
+        return Response(data)
+
+
+class AsyncRecipeDetailView(AsyncReadView):
+    viewset_class = RecipeViewSet
+    action = 'retrieve'
+
+    async def get(self, request, **kwargs):
+        # The filters of the list also apply to a detail, leave them to
+        # the sync view
+        if request.query_params:
+            return None
+        viewset = self.make_viewset(request, **kwargs)
+        try:
+            recipe = await viewset.get_queryset().aget(pk=kwargs['pk'])
+        except Recipe.DoesNotExist:
+            return None
+        context = viewset.get_serializer_context()
+        if request.user.is_authenticated:
+            context['subscribed_ids'] = await subscribed_ids.aget(
+                request.user.id)
+        return Response(RecipeGetSerializer(recipe, context=context).data)
+
+
+class AsyncShoppingListView(AsyncReadView):
+    """Download of the shopping list in one of EXPORT_FORMATS."""
+
+    async def get(self, request, **kwargs):
+        export_format = EXPORT_FORMATS.get(request.query_params.get(
+            SHOPPING_LIST_FORMAT_PARAM, SHOPPING_LIST_DEFAULT_FORMAT))
+        if request.user.is_anonymous or export_format is None:
+            return None
+        # A list holds at most one row per ingredient of the catalogue,
+        # it is read in full and rendered in memory
+        rows = [row async for row in shopping_list_items(request.user.id)
+                .aiterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)]
+        response = HttpResponse(''.join(export_format.render(rows)),
+                                content_type=export_format.content_type)
+        filename = f'{SHOPPING_LIST_FILENAME}.{export_format.extension}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
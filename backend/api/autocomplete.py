@@ -0,0 +1,63 @@
+import threading
+from bisect import bisect_left
+
+from .cache import CatalogueEntry, ingredients_catalogue
+
+
+class IngredientPrefixIndex:
+    """
+    In-process sorted prefix index over the ingredient catalogue.
+
+    The catalogue is small (~2000 rows) and rarely changes, so every worker
+    keeps it as a list sorted by the case-folded name. A prefix lookup is
+    then a binary search followed by a short forward scan, without a round
+    trip to the database.
+
+    The index is built from the cached ingredient catalogue and rebuilt
+    whenever the version of that catalogue changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Sorted case-folded names and the matching rows
+        self._index: tuple[list[str], list[dict]] = ([], [])
+        self._version: str | None = None
+
+    def _build(self, rows: list[dict]) -> None:
+        rows = sorted(rows,
+                      key=lambda row: (row['name'].casefold(), row['id']))
+        self._index = ([row['name'].casefold() for row in rows], rows)
+
+    def search(self, prefix: str, limit: int | None = None,
+               catalogue: CatalogueEntry | None = None) -> list[dict]:
+        """
+        Return ingredients whose name starts with prefix,
+        case-insensitively, in alphabetical order.
+
+        Parameters:
+        - prefix (str): The typed beginning of an ingredient name.
+        - limit (int | None): Maximum number of ingredients to return,
+        all of the matching ones by default.
+        - catalogue (CatalogueEntry | None): Ingredient catalogue already
+        read by the caller, the current one by default.
+        """
+        if catalogue is None:
+            catalogue = ingredients_catalogue.get()
+        if self._version != catalogue.version:
+            with self._lock:
+                if self._version != catalogue.version:
+                    self._build(catalogue.data)
+                    self._version = catalogue.version
+        keys, rows = self._index
+        prefix = prefix.casefold()
+        result = []
+        position = bisect_left(keys, prefix)
+        while (position < len(keys)
+               and (limit is None or len(result) < limit)
+               and keys[position].startswith(prefix)):
+            result.append(rows[position])
+            position += 1
+        return result
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,356 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import Awaitable, Callable, NamedTuple
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from authors.models import CustomUserSubscribe
+from config.db_router import primary_reads
+from recipes.models import Favorite, Ingredient, ShoppingCart, Tag
+
+from .constants import (FEED_CACHE_ALIAS, FEED_CACHE_LOCK_TIMEOUT,
+                        FEED_CACHE_POLL_INTERVAL, RECIPES_FEED_CACHE_MAX_PAGE,
+                        RECIPES_FEED_CACHE_TIMEOUT,
+                        RECIPES_FEED_UNCACHED_PARAMS, USER_ID_SET_TIMEOUT)
+
+
+def make_etag(*parts) -> str:
+    """Return a strong ETag built from the JSON dump of the given parts."""
+    dump = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return '"{}"'.format(hashlib.sha1(dump.encode()).hexdigest())
+
+
+def shared_token(key: str) -> str:
+    """
+    Return the random value stored under the key of the shared cache,
+    storing a new one when it is missing.
+    """
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        token = cache.get(key)
+    return token
+
+
+async def ashared_token(key: str) -> str:
+    """Async shared_token()."""
+    token = await cache.aget(key)
+    if token is None:
+        await cache.aadd(key, uuid.uuid4().hex, timeout=None)
+        token = await cache.aget(key)
+    return token
+
+
+class CatalogueEntry(NamedTuple):
+    version: str
+    data: list[dict]
+    by_id: dict[int, dict]
+    etag: str
+
+
+class CatalogueCache:
+    """
+    Versioned in-process cache of a serialized catalogue table.
+
+    Every worker keeps the serialized rows of a small, rarely-changing
+    table in memory. The version of the table lives in the shared Django
+    cache under a single key: signal receivers replace it when a row
+    changes, and a worker rebuilds its copy as soon as its version no
+    longer matches, so a request costs one cache read instead of a
+    database query and a serializer run.
+
+    The serializer is given as a dotted path so that the serializers can
+    use the cache themselves.
+    """
+
+    def __init__(self, name: str, queryset, serializer_class: str):
+        self.version_key = f'catalogue:{name}:version'
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self._lock = threading.Lock()
+        self._entry: CatalogueEntry | None = None
+
+    def version(self) -> str:
+        return shared_token(self.version_key)
+
+    def bump(self) -> None:
+        """Invalidate the copies of all workers once the write commits."""
+        transaction.on_commit(lambda: cache.set(
+            self.version_key, uuid.uuid4().hex, timeout=None))
+
+    def get(self) -> CatalogueEntry:
+        version = self.version()
+        entry = self._entry
+        if entry is None or entry.version != version:
+            with self._lock:
+                entry = self._entry
+                if entry is None or entry.version != version:
+                    entry = self._build(version)
+                    self._entry = entry
+        return entry
+
+    async def aget(self) -> CatalogueEntry:
+        """Async get(), the copy is rebuilt with the async ORM."""
+        version = await ashared_token(self.version_key)
+        entry = self._entry
+        if entry is None or entry.version != version:
+            with primary_reads():
+                objects = [obj async for obj in self.queryset.all()]
+            entry = self._build(version, objects)
+            self._entry = entry
+        return entry
+
+    def missing_ids(self, ids) -> set[int]:
+        """
+        Return the ids that do not belong to the catalogue.
+
+        Ids absent from the cached copy are checked with one query, as the
+        copy may not have caught up with a row inserted a moment ago.
+        """
+        missing = set(ids) - self.get().by_id.keys()
+        if missing:
+            missing -= set(self.queryset.filter(id__in=missing)
+                           .values_list('id', flat=True))
+        return missing
+
+    def _build(self, version: str, objects=None) -> CatalogueEntry:
+        serializer_class = import_string(self.serializer_class)
+        with primary_reads():
+            if objects is None:
+                objects = self.queryset.all()
+            data = [dict(row) for row in
+                    serializer_class(objects, many=True).data]
+        return CatalogueEntry(version=version,
+                              data=data,
+                              by_id={row['id']: row for row in data},
+                              etag=make_etag(data))
+
+
+# Steps of FeedCache.steps()
+BUILD_PAGE = 'build page'
+POLL = 'poll'
+
+
+class FeedCache:
+    """
+    Cache of the feed pages, shared by all users.
+
+    A page is stored under its normalized query string and the current
+    generation of the feed. The generation is a random value in the shared
+    Django cache that signal receivers replace when the feed content
+    changes, which orphans every stored page at once. A generation is never
+    used twice, so pages stored under an old one are not served again even
+    when the generation key itself gets evicted. The pages live in the
+    FEED_CACHE_ALIAS cache, shared by the workers like the default one.
+
+    Only one worker builds a missing page: it takes a lock in the pages
+    cache with add() while the others wait for the result.
+
+    Requests with one of the uncached params are never served from the
+    cache: the filters that depend on the user, and the orders by counters
+    that change without bumping the generation.
+
+    Like the other caches of this module, pages are built from the primary
+    database: a replica lagging behind the write that invalidated them
+    would store stale rows until they expire.
+    """
+
+    def __init__(self, name: str, timeout: int, max_page: int,
+                 uncached_params: tuple[str] = ()):
+        self.prefix = f'feed:{name}'
+        self.generation_key = f'{self.prefix}:generation'
+        self.timeout = timeout
+        self.max_page = max_page
+        self.uncached_params = uncached_params
+
+    @property
+    def pages(self):
+        return caches[FEED_CACHE_ALIAS]
+
+    def generation(self) -> str:
+        return shared_token(self.generation_key)
+
+    def bump(self) -> None:
+        """Invalidate the cached pages once the write commits."""
+        transaction.on_commit(lambda: cache.set(
+            self.generation_key, uuid.uuid4().hex, timeout=None))
+
+    def accepts(self, request) -> bool:
+        """Whether the response to the request can be shared."""
+        params = request.query_params
+        page = params.get('page', '1')
+        return (request.method == 'GET'
+                and page.isdigit()
+                and int(page) <= self.max_page
+                and not any(params.get(name)
+                            for name in self.uncached_params))
+
+    def key(self, request) -> str:
+        params = request.query_params
+        query = urlencode(sorted((name, value) for name in params
+                                 for value in params.getlist(name) if value))
+        digest = hashlib.sha1(
+            f'{request.get_host()}?{query}'.encode()).hexdigest()
+        return f'{self.prefix}:{self.generation()}:{digest}'
+
+    def steps(self, request):
+        """
+        Generator of the lookup, lock and poll logic of get_or_set(),
+        shared by its sync and async drivers: it yields BUILD_PAGE when the
+        page must be built and sent back, POLL when the driver must sleep
+        for FEED_CACHE_POLL_INTERVAL, and returns the page. Every read and
+        write of the caches happens between two steps. Closed while the
+        page is built, it releases the lock.
+
+        Parameters:
+        - request (Request): Anonymous GET request of the feed.
+        """
+        key = self.key(request)
+        data = self.pages.get(key)
+        if data is not None:
+            return data
+        lock_key = f'{key}:lock'
+        if self.pages.add(lock_key, 1, timeout=FEED_CACHE_LOCK_TIMEOUT):
+            try:
+                data = yield BUILD_PAGE
+                self.pages.set(key, data, timeout=self.timeout)
+            finally:
+                self.pages.delete(lock_key)
+            return data
+        # Another worker is building the page
+        deadline = time.monotonic() + FEED_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            yield POLL
+            data = self.pages.get(key)
+            if data is not None:
+                return data
+        return (yield BUILD_PAGE)
+
+    @staticmethod
+    def advance(steps, value) -> tuple[bool, object]:
+        """
+        Send the value into steps(), return (False, the next step) or
+        (True, the page) once it has returned: StopIteration itself cannot
+        be raised out of sync_to_async().
+        """
+        try:
+            return False, steps.send(value)
+        except StopIteration as stop:
+            return True, stop.value
+
+    def get_or_set(self, request, compute: Callable[[], dict]) -> dict:
+        """
+        Return the cached page for the request, building it with compute()
+        when it is missing.
+
+        Parameters:
+        - request (Request): Anonymous GET request of the feed.
+        - compute (callable): Returns the response data of the page.
+        """
+        with closing(self.steps(request)) as steps:
+            done, step = self.advance(steps, None)
+            while not done:
+                if step is BUILD_PAGE:
+                    with primary_reads():
+                        value = compute()
+                else:
+                    value = None
+                    time.sleep(FEED_CACHE_POLL_INTERVAL)
+                done, step = self.advance(steps, value)
+            return step
+
+    async def aget_or_set(self, request,
+                          compute: Callable[[], Awaitable[dict]]) -> dict:
+        """
+        Async get_or_set(), compute() is a coroutine function. The steps
+        read and write the caches, files by default, so they run in a
+        thread rather than in the event loop.
+        """
+        steps = self.steps(request)
+        advance = sync_to_async(self.advance)
+        try:
+            done, step = await advance(steps, None)
+            while not done:
+                if step is BUILD_PAGE:
+                    with primary_reads():
+                        value = await compute()
+                else:
+                    value = None
+                    await asyncio.sleep(FEED_CACHE_POLL_INTERVAL)
+                done, step = await advance(steps, value)
+            return step
+        except BaseException:
+            await sync_to_async(steps.close)()
+            raise
+
+
+class UserIdSet:
+    """
+    Per-user set of ids kept in the shared Django cache.
+
+    The set is loaded with one query on the first use and dropped by
+    signal receivers when one of its rows is added or removed.
+    """
+
+    def __init__(self, name: str, queryset, user_field: str, id_field: str):
+        self.prefix = f'ids:{name}'
+        self.queryset = queryset
+        self.user_field = user_field
+        self.id_field = id_field
+
+    def key(self, user_id: int) -> str:
+        return f'{self.prefix}:{user_id}'
+
+    def get(self, user_id: int) -> frozenset[int]:
+        key = self.key(user_id)
+        ids = cache.get(key)
+        if ids is None:
+            with primary_reads():
+                ids = frozenset(self.queryset
+                                .filter(**{self.user_field: user_id})
+                                .values_list(self.id_field, flat=True))
+            cache.set(key, ids, timeout=USER_ID_SET_TIMEOUT)
+        return ids
+
+    async def aget(self, user_id: int) -> frozenset[int]:
+        """Async get(), the set is loaded with the async ORM."""
+        key = self.key(user_id)
+        ids = await cache.aget(key)
+        if ids is None:
+            with primary_reads():
+                ids = frozenset([id async for id in self.queryset
+                                 .filter(**{self.user_field: user_id})
+                                 .values_list(self.id_field, flat=True)])
+            await cache.aset(key, ids, timeout=USER_ID_SET_TIMEOUT)
+        return ids
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop the set of the user once the write commits."""
+        key = self.key(user_id)
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+tags_catalogue = CatalogueCache('tags',
+                                Tag.objects.order_by('id'),
+                                'api.serializers.TagSerializer')
+ingredients_catalogue = CatalogueCache('ingredients',
+                                       Ingredient.objects.order_by('id'),
+                                       'api.serializers.IngredientSerializer')
+recipes_feed_cache = FeedCache('recipes',
+                               timeout=RECIPES_FEED_CACHE_TIMEOUT,
+                               max_page=RECIPES_FEED_CACHE_MAX_PAGE,
+                               uncached_params=RECIPES_FEED_UNCACHED_PARAMS)
+favorite_ids = UserIdSet('favorites', Favorite.objects,
+                         'user_id', 'recipe_id')
+cart_ids = UserIdSet('cart', ShoppingCart.objects, 'user_id', 'recipe_id')
+subscribed_ids = UserIdSet('subscriptions', CustomUserSubscribe.objects,
+                           'user_id', 'author_id')
@@ -6,5 +6,61 @@ Constants for app 'api'
 USERS_PAGE_SIZE: int = 10
 RECIPES_PAGE_SIZE: int = 10
 
-# serializers.py
+# cache.py
+# Cache alias holding the feed pages, the generations stay in 'default'
+FEED_CACHE_ALIAS: str = 'feed'
+RECIPES_FEED_CACHE_TIMEOUT: int = 5 * 60
+# Only the first pages of a feed are cached
+RECIPES_FEED_CACHE_MAX_PAGE: int = 5
+# Seconds a worker may spend building a page before others stop waiting
+FEED_CACHE_LOCK_TIMEOUT: int = 10
+FEED_CACHE_POLL_INTERVAL: float = 0.05
+# Query params whose feed pages are never cached: the filters depending on
+# the user, and the ordering, by favorites_count among others, which
+# favorites change without bumping the feed
+RECIPES_FEED_UNCACHED_PARAMS: tuple[str] = ('is_favorited',
+                                            'is_in_shopping_cart',
+                                            'ordering')
+USER_ID_SET_TIMEOUT: int = 60 * 60
+
+# fields.py
+# Base64 characters read from an upload at a time
+BASE64_CHUNK_SIZE: int = 64 * 1024
+
+# filters.py
+# Fields the recipes can be ordered by with ?ordering=[-]<field>
+RECIPE_ORDERING_FIELDS: tuple[str] = ('favorites_count', 'pub_date')
+
+# mixins.py
+# ?pagination=cursor switches a feed to keyset pagination
+PAGINATION_QUERY_PARAM: str = 'pagination'
+CURSOR_PAGINATION: str = 'cursor'
+
+# utils.py
 DEFAULT_RECIPES_PAGE_SIZE_ON_SUB: int = 3
+
+# serializers.py
+# Ids accepted by one call of a bulk endpoint
+BULK_IDS_MAX_LENGTH: int = 100
+
+# views.py
+INGREDIENTS_AUTOCOMPLETE_LIMIT: int = 10
+INGREDIENTS_AUTOCOMPLETE_MAX_LIMIT: int = 50
+SHOPPING_LIST_FORMAT_PARAM: str = 'file_format'
+SHOPPING_LIST_DEFAULT_FORMAT: str = 'txt'
+SHOPPING_LIST_FILENAME: str = 'shopping_list'
+# Rows fetched per round trip of the server-side cursor
+SHOPPING_LIST_CHUNK_SIZE: int = 500
+
+# exports.py
+SHOPPING_LIST_PRINT_WIDTH: int = 48
+
+# tasks.py
+# Seconds an exported shopping list file is kept in the media storage
+SHOPPING_LIST_EXPORT_LIFETIME: int = 60 * 60
+
+# middleware.py
+# Requests whose reads may go to the replicas
+REPLICA_READS_PATH: str = '/api/'
+# Time until which a client reads from the primary, set on a write
+PRIMARY_PIN_COOKIE: str = 'primary_pin'
@@ -0,0 +1,92 @@
+import csv
+import json
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from django.db.models import F, QuerySet
+
+from recipes.models import ShoppingListItem
+
+from .constants import SHOPPING_LIST_CHUNK_SIZE, SHOPPING_LIST_PRINT_WIDTH
+
+# Every row is a dict with the keys 'name', 'measurement_unit' and 'amount'
+Rows = Iterable[dict]
+
+
+def shopping_list_items(user_id: int) -> QuerySet:
+    """Rows of the shopping list of a user in alphabetical order."""
+    return (ShoppingListItem.objects
+            .filter(user_id=user_id)
+            .values('amount',
+                    name=F('ingredient__name'),
+                    measurement_unit=F('ingredient__measurement_unit'))
+            .order_by('name'))
+
+
+def shopping_list_rows(user_id: int) -> Iterator[dict]:
+    """
+    Iterate over the shopping list of a user in alphabetical order.
+
+    The rows come from the materialized per-user totals and are read
+    through a server-side cursor, so memory use does not grow with the
+    cart.
+    """
+    return shopping_list_items(user_id).iterator(
+        chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+
+
+class Echo:
+    """File-like object that returns what is written, for csv.writer."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def render_txt(rows: Rows) -> Iterator[str]:
+    yield 'Shopping list:\n'
+    for i, row in enumerate(rows):
+        yield (f'{i + 1}. {row["name"]} ({row["measurement_unit"]}) '
+               f'— {row["amount"]}\n')
+
+
+def render_csv(rows: Rows) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(['name', 'measurement_unit', 'amount'])
+    for row in rows:
+        yield writer.writerow([row['name'], row['measurement_unit'],
+                               row['amount']])
+
+
+def render_json(rows: Rows) -> Iterator[str]:
+    separator = ''
+    yield '['
+    for row in rows:
+        item = {'name': row['name'],
+                'measurement_unit': row['measurement_unit'],
+                'amount': row['amount']}
+        yield separator + json.dumps(item, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+def render_print(rows: Rows) -> Iterator[str]:
+    """One checkbox line per ingredient with the amount aligned right."""
+    for row in rows:
+        name = f'{row["name"]}, {row["measurement_unit"]} '
+        amount = f' {row["amount"]}'
+        dots = '.' * max(SHOPPING_LIST_PRINT_WIDTH - len(name) - len(amount),
+                         0)
+        yield f'[ ] {name}{dots}{amount}\n'
+
+
+class ExportFormat(NamedTuple):
+    render: Callable[[Rows], Iterator[str]]
+    content_type: str
+    extension: str
+
+
+EXPORT_FORMATS: dict[str, ExportFormat] = {
+    'txt': ExportFormat(render_txt, 'text/plain; charset=utf-8', 'txt'),
+    'csv': ExportFormat(render_csv, 'text/csv; charset=utf-8', 'csv'),
+    'json': ExportFormat(render_json, 'application/json', 'json'),
+    'print': ExportFormat(render_print, 'text/plain; charset=utf-8', 'txt'),
+}
@@ -1,13 +1,103 @@
 import base64
+import binascii
+import hashlib
+from pathlib import PurePath
+from urllib.parse import urlparse
 
-from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
 from rest_framework import serializers
 
+from .constants import BASE64_CHUNK_SIZE
+
+BASE64_MARKER = ';base64,'
+# Characters b64decode() skips, they are removed before the payload is cut
+# into 4-character aligned chunks
+BASE64_WHITESPACE = str.maketrans('', '', ' \t\n\r\v\f')
+
+
+def base64_chunks(data: str, start: int):
+    """
+    Yield the base64 payload of data from start on in chunks of whole
+    4-character groups, without whitespace, so that each one decodes on
+    its own. An incomplete group is left for the last chunk.
+    """
+    leftover = ''
+    for position in range(start, len(data), BASE64_CHUNK_SIZE):
+        chunk = leftover + data[position:position + BASE64_CHUNK_SIZE]
+        chunk = chunk.translate(BASE64_WHITESPACE)
+        aligned = len(chunk) - len(chunk) % 4
+        chunk, leftover = chunk[:aligned], chunk[aligned:]
+        if chunk:
+            yield chunk
+    if leftover:
+        yield leftover
+
+
+def decode_base64_image(data: str) -> TemporaryUploadedFile:
+    """
+    Decode a base64 data URI chunk by chunk into a temporary file named
+    after the SHA-256 hash of the decoded content.
+
+    Only one chunk of the decoded image is held in memory at a time, and
+    the hash lets the storage keep a single copy of identical uploads.
+
+    Parameters:
+    - data (str): 'data:image/<ext>;base64,<payload>' string.
+    """
+    marker = data.find(BASE64_MARKER)
+    if marker == -1:
+        raise serializers.ValidationError('Invalid image data URI!')
+    ext = ''.join(char for char in data[len('data:image/'):marker]
+                  if char.isalnum())
+    digest = hashlib.sha256()
+    file = TemporaryUploadedFile(name='upload', content_type=None,
+                                 size=0, charset=None)
+    try:
+        for chunk in base64_chunks(data, marker + len(BASE64_MARKER)):
+            chunk = base64.b64decode(chunk)
+            digest.update(chunk)
+            file.write(chunk)
+    except binascii.Error:
+        file.close()
+        raise serializers.ValidationError('Invalid base64 image!')
+    file.size = file.tell()
+    file.seek(0)
+    file.name = f'{digest.hexdigest()}.{ext}'
+    return file
+
 
 class Base64ImageField(serializers.ImageField):
+    """
+    Image field accepting base64 data URIs.
+
+    When updating, a payload that is the URL of the current image or has
+    the same content hash leaves the field out of validated_data, so the
+    image is neither written to storage again nor reprocessed.
+    """
+
+    def current_image(self):
+        instance = getattr(self.parent, 'instance', None)
+        return getattr(instance, self.source, None) if instance else None
+
     def to_internal_value(self, data):
+        current = self.current_image()
+        if (current and isinstance(data, str)
+                and urlparse(data).path == current.url):
+            raise serializers.SkipField()
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = decode_base64_image(data)
+            if current and PurePath(current.name).name == data.name:
+                data.close()
+                raise serializers.SkipField()
         return super().to_internal_value(data)
+
+
+class ImageVariantField(serializers.ImageField):
+    """URL of a resized image variant, or of the original when missing."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return super().get_attribute(instance) or instance.image
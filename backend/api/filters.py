@@ -1,19 +1,71 @@
+from django import forms
+from django.db.models import Count, Exists, OuterRef
 from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
 
-from recipes.models import Recipe, Tag
+from recipes.models import Recipe, RecipeIngredient
+from recipes.search import search_recipes
+
+from .cache import tags_catalogue
+from .constants import RECIPE_ORDERING_FIELDS
+
+
+def tag_choices() -> list[tuple[str, str]]:
+    return [(row['slug'], row['name']) for row in tags_catalogue.get().data]
+
+
+class IntegerFilter(filters.Filter):
+    field_class = forms.IntegerField
+
+
+class IntegerInFilter(filters.BaseInFilter, IntegerFilter):
+    """Comma-separated list of ids: ?ingredients_all=1,2,3"""
+
+
+class StableOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter that breaks the ties by the newest id, so rows with an
+    equal key keep their place from one page to the next.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        return qs.order_by(*ordering, '-id')
 
 
 class RecipeFilterSet(filters.FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(queryset=Tag.objects.all(),
-                                             field_name='tags__slug',
-                                             to_field_name='slug')
+    # Slugs are checked and resolved with the cached tag catalogue
+    tags = filters.MultipleChoiceFilter(choices=tag_choices,
+                                        method='get_tags')
     is_favorited = filters.BooleanFilter(method='get_favorite')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart')
+    search = filters.CharFilter(method='get_search')
+    # Ingredient ids; each filter is a set operation on the
+    # (ingredient, recipe) index of RecipeIngredient
+    ingredients_all = IntegerInFilter(method='get_ingredients_all')
+    ingredients_any = IntegerInFilter(method='get_ingredients_any')
+    ingredients_exclude = IntegerInFilter(method='get_ingredients_exclude')
+    # ?ordering=-favorites_count lists the most favorited recipes first
+    ordering = StableOrderingFilter(fields=RECIPE_ORDERING_FIELDS)
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ingredients_all', 'ingredients_any',
+                  'ingredients_exclude', 'ordering']
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        tag_ids = [row['id'] for row in tags_catalogue.get().data
+                   if row['slug'] in value]
+        # A semi-join returns every recipe once, with no DISTINCT needed
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(recipe_id=OuterRef('pk'),
+                                               tag_id__in=tag_ids)))
 
     def get_favorite(self, queryset, name, value):
         user = self.request.user
@@ -26,3 +78,37 @@ class RecipeFilterSet(filters.FilterSet):
         if user.is_authenticated and value:
             return queryset.filter(shopping_cart__user=user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        if value.strip():
+            return search_recipes(queryset, value)
+        return queryset
+
+    @staticmethod
+    def with_ingredients(ingredient_ids):
+        return (RecipeIngredient.objects
+                .filter(ingredient_id__in=set(ingredient_ids))
+                .order_by())
+
+    def get_ingredients_all(self, queryset, name, value):
+        if not value:
+            return queryset
+        # Recipes having as many of the ingredients as were asked for
+        recipe_ids = (self.with_ingredients(value)
+                      .values('recipe_id')
+                      .annotate(matched=Count('ingredient_id'))
+                      .filter(matched=len(set(value)))
+                      .values('recipe_id'))
+        return queryset.filter(id__in=recipe_ids)
+
+    def get_ingredients_any(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(
+            id__in=self.with_ingredients(value).values('recipe_id'))
+
+    def get_ingredients_exclude(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(~Exists(
+            self.with_ingredients(value).filter(recipe=OuterRef('pk'))))
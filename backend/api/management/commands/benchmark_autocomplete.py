@@ -0,0 +1,64 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.autocomplete import ingredient_index
+from api.constants import INGREDIENTS_AUTOCOMPLETE_LIMIT
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = ('Compare keystroke-by-keystroke ingredient lookups: '
+            'database prefix search against the in-process index')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words',
+                            type=int,
+                            default=200,
+                            help='Number of ingredient names to type')
+        parser.add_argument('--seed',
+                            type=int,
+                            default=0,
+                            help='Random seed for picking the names')
+
+    @staticmethod
+    def measure(lookup, prefixes: list[str]) -> list[float]:
+        timings = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            lookup(prefix)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def report(self, label: str, timings: list[float]) -> None:
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        self.stdout.write(f'{label:<10} mean {statistics.mean(timings):.3f} '
+                          f'ms, p95 {p95:.3f} ms')
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            raise CommandError('The ingredient catalogue is empty')
+        random.seed(options.get('seed'))
+        words = random.sample(names, min(options.get('words'), len(names)))
+        # Every keystroke of every word: 'м', 'мо', 'мол', ...
+        prefixes = [word[:length] for word in words
+                    for length in range(1, len(word) + 1)]
+        limit = INGREDIENTS_AUTOCOMPLETE_LIMIT
+        self.stdout.write(f'{len(prefixes)} lookups over {len(names)} '
+                          f'ingredients, limit {limit}')
+
+        def database_lookup(prefix):
+            return list(Ingredient.objects
+                        .filter(name__istartswith=prefix)
+                        .order_by('name')
+                        .values('id', 'name', 'measurement_unit')[:limit])
+
+        def index_lookup(prefix):
+            return ingredient_index.search(prefix, limit)
+
+        index_lookup('')  # Build the index outside of the measurement
+        self.report('database', self.measure(database_lookup, prefixes))
+        self.report('index', self.measure(index_lookup, prefixes))
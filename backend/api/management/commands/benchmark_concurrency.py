@@ -0,0 +1,238 @@
+import asyncio
+import importlib.util
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Ingredient, Recipe
+
+# Server command lines, {workers} and {bind} are filled in
+SERVERS = {
+    'sync': ['gunicorn', 'config.wsgi', '--workers', '{workers}',
+             '--bind', '{bind}'],
+    'async': ['gunicorn', 'config.asgi', '--workers', '{workers}',
+              '--bind', '{bind}',
+              '--worker-class', 'uvicorn.workers.UvicornWorker'],
+}
+SERVER_START_TIMEOUT = 30
+# Statuses whose responses never have a body
+BODILESS_STATUSES = (204, 304)
+
+
+class Stats:
+    def __init__(self):
+        self.timings: list[float] = []
+        self.failed = 0
+        self.errors = 0
+
+
+async def read_response(reader) -> tuple[int, bool]:
+    """Read one response, return its status and whether to keep alive."""
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+    status_line, *lines = head.rstrip('\r\n').split('\r\n')
+    version, status = status_line.split()[:2]
+    status = int(status)
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+    keep_alive = (version == 'HTTP/1.1'
+                  and headers.get('connection') != 'close')
+    if status in BODILESS_STATUSES:
+        return status, keep_alive
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive
+
+
+async def run_client(url, requests: list[bytes], offset: int,
+                     start: float, deadline: float, stats: Stats) -> None:
+    """
+    Send the requests round-robin over one keep-alive connection until
+    the deadline, recording the ones sent after start.
+    """
+    reader = writer = None
+    number = offset
+    while time.monotonic() < deadline:
+        sent = time.monotonic()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(
+                    url.hostname, url.port)
+            writer.write(requests[number % len(requests)])
+            number += 1
+            status, keep_alive = await read_response(reader)
+        except (OSError, ValueError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError):
+            if sent >= start:
+                stats.errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.01)
+            continue
+        if sent >= start:
+            stats.timings.append((time.monotonic() - sent) * 1000)
+            stats.failed += status >= 400
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+class Command(BaseCommand):
+    help = ('Compare the throughput of the hot read endpoints on the sync '
+            '(WSGI) and async (ASGI) servers under many concurrent '
+            'keep-alive clients')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients',
+                            type=int,
+                            default=500,
+                            help='Number of concurrent connections')
+        parser.add_argument('--duration',
+                            type=float,
+                            default=20,
+                            help='Seconds to measure for')
+        parser.add_argument('--warmup',
+                            type=float,
+                            default=3,
+                            help='Seconds of load before measuring')
+        parser.add_argument('--workers',
+                            type=int,
+                            default=4,
+                            help='Worker processes of the started servers')
+        parser.add_argument('--path',
+                            action='append',
+                            dest='paths',
+                            help='Path to request, may be repeated; the hot '
+                                 'read endpoints by default')
+        parser.add_argument('--token',
+                            help='Send the requests with this auth token')
+        parser.add_argument('--sync-url',
+                            help='Benchmark a running sync server instead '
+                                 'of starting one')
+        parser.add_argument('--async-url',
+                            help='Benchmark a running async server instead '
+                                 'of starting one')
+
+    @staticmethod
+    def default_paths(token: str | None) -> list[str]:
+        paths = ['/api/recipes/', '/api/recipes/?page=2', '/api/tags/',
+                 '/api/ingredients/']
+        recipe_id = Recipe.objects.values_list('id', flat=True).first()
+        if recipe_id:
+            paths.append(f'/api/recipes/{recipe_id}/')
+        name = Ingredient.objects.values_list('name', flat=True).first()
+        if name:
+            # A request line is ASCII, uvicorn rejects anything else
+            paths.append(f'/api/ingredients/?name={quote(name[:2])}')
+        if token:
+            paths.append('/api/recipes/download_shopping_cart/')
+        return paths
+
+    @staticmethod
+    def free_address() -> str:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return '127.0.0.1:{}'.format(sock.getsockname()[1])
+
+    def start_server(self, kind: str, workers: int):
+        bind = self.free_address()
+        command = [arg.format(workers=workers, bind=bind)
+                   for arg in SERVERS[kind]]
+        env = dict(os.environ,
+                   DJANGO_DEBUG='False',
+                   DJANGO_ASYNC_READ_VIEWS=str(kind == 'async'),
+                   DJANGO_ALLOWED_HOSTS=f'{settings.ALLOWED_HOSTS[0]} '
+                                        f'127.0.0.1')
+        process = subprocess.Popen(
+            [sys.executable, '-m', *command], cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        host, port = bind.split(':')
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'The {kind} server exited on start')
+            try:
+                socket.create_connection((host, int(port)), timeout=1).close()
+                return process, f'http://{bind}'
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f'The {kind} server did not start')
+
+    @staticmethod
+    def make_requests(url, paths: list[str], token: str | None):
+        auth = f'Authorization: Token {token}\r\n' if token else ''
+        return [(f'GET {path} HTTP/1.1\r\n'
+                 f'Host: {url.hostname}\r\n'
+                 f'Accept: application/json\r\n'
+                 f'{auth}'
+                 f'Connection: keep-alive\r\n\r\n').encode()
+                for path in paths]
+
+    async def load(self, url, requests: list[bytes], options: dict):
+        stats = Stats()
+        start = time.monotonic() + options.get('warmup')
+        deadline = start + options.get('duration')
+        await asyncio.gather(*(
+            run_client(url, requests, number, start, deadline, stats)
+            for number in range(options.get('clients'))))
+        return stats
+
+    def report(self, label: str, stats: Stats, duration: float) -> None:
+        if len(stats.timings) < 2:
+            self.stdout.write(f'{label:<6} no responses, '
+                              f'{stats.errors} connection errors')
+            return
+        percentiles = statistics.quantiles(stats.timings, n=100)
+        self.stdout.write(
+            f'{label:<6} {len(stats.timings) / duration:8.1f} req/s, '
+            f'p50 {percentiles[49]:.1f} ms, p95 {percentiles[94]:.1f} ms, '
+            f'p99 {percentiles[98]:.1f} ms, {stats.failed} failed, '
+            f'{stats.errors} connection errors')
+
+    def handle(self, *args, **options):
+        token = options.get('token')
+        paths = options.get('paths') or self.default_paths(token)
+        urls = {'sync': options.get('sync_url'),
+                'async': options.get('async_url')}
+        if not all(urls.values()):
+            for module in ('gunicorn', 'uvicorn'):
+                if importlib.util.find_spec(module) is None:
+                    raise CommandError(f'{module} is needed to start the '
+                                       f'servers')
+        self.stdout.write(f'{options.get("clients")} clients, '
+                          f'{len(paths)} paths: {" ".join(paths)}')
+        for kind, url in urls.items():
+            process = None
+            if not url:
+                process, url = self.start_server(kind,
+                                                 options.get('workers'))
+            try:
+                url = urlsplit(url)
+                stats = asyncio.run(self.load(
+                    url, self.make_requests(url, paths, token), options))
+            finally:
+                if process is not None:
+                    process.terminate()
+                    process.wait()
+            self.report(kind, stats, options.get('duration'))
@@ -0,0 +1,64 @@
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.permissions import SAFE_METHODS
+
+from config.db_router import replica_reads
+
+from .constants import PRIMARY_PIN_COOKIE, REPLICA_READS_PATH
+
+
+def reads_from_replica(request) -> bool:
+    """
+    Whether the request is a safe API call of a client that has not
+    written anything for DATABASE_REPLICA_PIN_SECONDS.
+    """
+    if (request.method not in SAFE_METHODS
+            or not request.path.startswith(REPLICA_READS_PATH)):
+        return False
+    pinned_until = request.COOKIES.get(PRIMARY_PIN_COOKIE)
+    if pinned_until is None:
+        return True
+    try:
+        return float(pinned_until) < time.time()
+    except ValueError:
+        # A cookie the server did not set cannot tell that the client has
+        # not written lately, keep it on the primary
+        return False
+
+
+def pin_to_primary(request, response):
+    """Keep the client on the primary for a while after a write."""
+    if (request.method not in SAFE_METHODS
+            and request.path.startswith(REPLICA_READS_PATH)):
+        seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+        response.set_cookie(PRIMARY_PIN_COOKIE, str(time.time() + seconds),
+                            max_age=seconds, httponly=True, samesite='Lax')
+    return response
+
+
+@sync_and_async_middleware
+def replica_reads_middleware(get_response):
+    """
+    Send the reads of the safe API requests to the replicas, except for
+    the clients that have written lately: the response to a write sets a
+    short-lived cookie that keeps the client on the primary until the
+    replicas have caught up, so it reads its own writes.
+    """
+    if not settings.DATABASE_REPLICAS:
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with replica_reads(reads_from_replica(request)):
+                response = await get_response(request)
+            return pin_to_primary(request, response)
+    else:
+        def middleware(request):
+            with replica_reads(reads_from_replica(request)):
+                response = get_response(request)
+            return pin_to_primary(request, response)
+    return middleware
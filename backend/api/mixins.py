@@ -0,0 +1,114 @@
+from functools import partial
+
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+
+from .cache import CatalogueCache, CatalogueEntry, FeedCache, make_etag
+from .constants import CURSOR_PAGINATION, PAGINATION_QUERY_PARAM
+
+
+class CachedCatalogueMixin:
+    """
+    Serve list and retrieve of a read-only viewset from a CatalogueCache.
+
+    Responses carry a strong ETag and a request whose If-None-Match
+    matches it gets an empty 304, so most calls touch neither the database
+    nor the serializer.
+    """
+    catalogue: CatalogueCache = None
+
+    def filter_catalogue(self, entry: CatalogueEntry) -> list[dict]:
+        """Hook to narrow the cached rows down using the query params."""
+        return entry.data
+
+    def cached_response(self, request, data, etag: str) -> Response:
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in parse_etags(if_none_match) or if_none_match == '*':
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+        return Response(data, headers={'ETag': etag})
+
+    def list(self, request, *args, **kwargs):
+        return self.catalogue_list(request, self.catalogue.get())
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.catalogue_detail(request, self.catalogue.get())
+
+    def catalogue_list(self, request, entry: CatalogueEntry) -> Response:
+        data = self.filter_catalogue(entry)
+        etag = (entry.etag if data is entry.data
+                else make_etag(entry.etag, request.query_params))
+        return self.cached_response(request, data, etag)
+
+    def catalogue_detail(self, request, entry: CatalogueEntry) -> Response:
+        lookup = str(self.kwargs.get(self.lookup_url_kwarg
+                                     or self.lookup_field))
+        row = entry.by_id.get(int(lookup)) if lookup.isdigit() else None
+        if row is None:
+            raise NotFound()
+        return self.cached_response(request, row, make_etag(row))
+
+
+class CachedFeedMixin:
+    """
+    Serve list pages from a FeedCache.
+
+    The cached page is the body shared by all users, as an anonymous
+    visitor sees it; for a logged-in user overlay_feed() then fills in the
+    few per-user fields. The query and the serializers only run once per
+    page and feed generation.
+    """
+    feed_cache: FeedCache = None
+
+    def overlay_feed(self, data: dict, user) -> dict:
+        """
+        Hook setting the per-user fields of a page, to their anonymous
+        values when user is None.
+        """
+        return data
+
+    def list(self, request, *args, **kwargs):
+        if not self.feed_cache.accepts(request):
+            return super().list(request, *args, **kwargs)
+        build_page = partial(super().list, request, *args, **kwargs)
+        data = self.feed_cache.get_or_set(
+            request, lambda: self.overlay_feed(build_page().data, None))
+        if request.user.is_authenticated:
+            data = self.overlay_feed(data, request.user)
+        return Response(data)
+
+
+class SelectablePaginationMixin:
+    """
+    Let a request choose keyset pagination with ?pagination=cursor.
+
+    The default page number pagination keeps serving the current frontend,
+    while infinite-scroll clients get cursor pages, which need neither a
+    COUNT(*) nor an OFFSET scan. Only the actions listed in
+    cursor_pagination_actions can switch.
+
+    A cursor page keeps the order of its pagination class, so the query
+    params listed in cursor_pagination_conflicts, which order the rows
+    their own way, are refused with it rather than silently ignored.
+    """
+    cursor_pagination_class = None
+    cursor_pagination_actions: tuple[str] = ('list',)
+    cursor_pagination_conflicts: tuple[str] = ()
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            param = self.request.query_params.get(PAGINATION_QUERY_PARAM)
+            if (param != CURSOR_PAGINATION
+                    or self.action not in self.cursor_pagination_actions):
+                return super().paginator
+            conflicts = [name for name in self.cursor_pagination_conflicts
+                         if self.request.query_params.get(name)]
+            if conflicts:
+                raise ValidationError({PAGINATION_QUERY_PARAM: (
+                    f'Cursor pages can not be combined with '
+                    f'{", ".join(conflicts)}!')})
+            self._paginator = self.cursor_pagination_class()
+        return self._paginator
@@ -1,4 +1,6 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from recipes.models import FeedEntry
 
 from .constants import USERS_PAGE_SIZE, RECIPES_PAGE_SIZE
 
@@ -11,3 +13,31 @@ class UsersPagination(PageNumberPagination):
 class RecipesPagination(PageNumberPagination):
     page_size = RECIPES_PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class UsersCursorPagination(CursorPagination):
+    page_size = USERS_PAGE_SIZE
+    page_size_query_param = 'limit'
+    ordering = ('id',)
+
+
+class RecipesCursorPagination(CursorPagination):
+    """
+    Newest recipes first, keyed by the recipe id.
+
+    The cursor only holds the first ordering field, plus an offset among
+    the rows that share its value, so the field must be unique: ordered by
+    pub_date, a page repeats or skips recipes published at the same moment
+    when one of them is deleted between two requests. Recipe ids grow with
+    pub_date, and the primary key serves the order.
+    """
+    page_size = RECIPES_PAGE_SIZE
+    page_size_query_param = 'limit'
+    ordering = ('-id',)
+
+    def get_ordering(self, request, queryset, view):
+        # Timelines are read from the (user, recipe) index of FeedEntry,
+        # whose own ids follow the fan-out rather than the publication
+        if queryset.model is FeedEntry:
+            return ('-recipe_id',)
+        return super().get_ordering(request, queryset, view)
@@ -1,16 +1,30 @@
 from django.contrib.auth import get_user_model
-from django.db.models import F
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
+from jobs.models import Job
+from jobs.runner import enqueue
+from recipes import shopping_list
 from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
 
-from .constants import DEFAULT_RECIPES_PAGE_SIZE_ON_SUB
-from .fields import Base64ImageField
-from .utils import add_ingredients_to_recipe
+from .cache import ingredients_catalogue, tags_catalogue
+from .constants import BULK_IDS_MAX_LENGTH
+from .fields import Base64ImageField, ImageVariantField
+from .utils import (add_ingredients_to_recipe, check_foreign_keys,
+                    get_recipes_limit, get_subscribed_ids,
+                    update_recipe_ingredients)
 
 User = get_user_model()
 
+# Field and message of the error for a missing row referenced by a table
+REFERENCE_ERRORS: dict[str, tuple[str, str]] = {
+    RecipeIngredient._meta.db_table: ('ingredients',
+                                      'Non existing ingredient!'),
+    Recipe.tags.through._meta.db_table: ('tags', 'Non existing tag!'),
+}
+
 
 class AuthorSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
@@ -24,28 +38,24 @@ class AuthorSerializer(UserSerializer):
         user = self.context['request'].user
         if user.is_anonymous:
             return False
-        return obj.subscribers.filter(user=user).exists()
+        return obj.id in get_subscribed_ids(self.context)
 
 
 class AuthorWithRecipesSerializer(AuthorSerializer):
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
     recipes = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = AuthorSerializer.Meta.fields + ['recipes_count', 'recipes']
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.all().count()
-
     def get_recipes(self, obj):
-        recipes_limit: int = DEFAULT_RECIPES_PAGE_SIZE_ON_SUB
-        request: dict = self.context.get('request')
-        if request:
-            param: str = request.query_params.get('recipes_limit')
-            if param and param.isdigit():
-                recipes_limit = int(param)
-        recipes = obj.recipes.all()[:recipes_limit]
+        # Prefetched by CustomUserViewSet.subscriptions
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            recipes = obj.recipes.all()[:recipes_limit]
         return RecipeMinifiedSerializer(recipes, many=True).data
 
 
@@ -69,42 +79,58 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'amount']
 
 
+class RecipeIngredientGetSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ['id', 'name', 'measurement_unit', 'amount']
+
+
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
+    image_thumbnail = ImageVariantField()
+    image_card = ImageVariantField()
+
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_thumbnail', 'image_card',
+                  'cooking_time']
 
 
 class RecipeGetSerializer(serializers.ModelSerializer):
     author = AuthorSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
-    ingredients = serializers.SerializerMethodField()
+    # Built from the through rows prefetched by RecipeViewSet
+    ingredients = RecipeIngredientGetSerializer(source='recipe_ingredients',
+                                                many=True, read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_thumbnail = ImageVariantField()
+    image_card = ImageVariantField()
 
     class Meta:
         model = Recipe
         fields = ['id', 'author', 'name', 'text',
                   'cooking_time', 'ingredients',
-                  'tags', 'image', 'is_favorited',
-                  'is_in_shopping_cart']
-
-    def get_ingredients(self, obj):
-        return obj.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            # Add an aditional field and alter its name
-            amount=F('ingredient_in_recipe__amount')
-        )
+                  'tags', 'image', 'image_thumbnail', 'image_card',
+                  'is_favorited', 'is_in_shopping_cart']
 
     def get_is_favorited(self, obj):
+        # Annotated by RecipeViewSet.get_queryset
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         if user.is_anonymous:
             return False
         return user.favorite.filter(recipe_id=obj.id).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        # Annotated by RecipeViewSet.get_queryset
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         if user.is_anonymous:
             return False
@@ -114,8 +140,8 @@ class RecipeGetSerializer(serializers.ModelSerializer):
 class RecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
     ingredients = RecipeIngredientSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(many=True,
-                                              queryset=Tag.objects.all())
+    # Plain ids, checked against the cached tag catalogue
+    tags = serializers.ListField(child=serializers.IntegerField())
 
     class Meta:
         model = Recipe
@@ -145,8 +171,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             )
 
         # At least one of the ingredients does not exist in the database
-        if not (Ingredient.objects.filter(id__in=provided_ids)
-                .distinct().count()) == len(provided_ids):
+        if ingredients_catalogue.missing_ids(provided_ids):
             raise serializers.ValidationError('Non existing ingredient!')
 
         return value
@@ -160,8 +185,31 @@ class RecipeSerializer(serializers.ModelSerializer):
         if not len(set(value)) == len(value):
             raise serializers.ValidationError('Multiple identical tags!')
 
+        # At least one of the tags does not exist in the database
+        if tags_catalogue.missing_ids(value):
+            raise serializers.ValidationError('Non existing tag!')
+
         return value
 
+    def check_references(self):
+        """
+        Check the deferred foreign keys before leaving the transaction, so
+        that an ingredient or tag deleted after the validation is reported
+        like a missing one instead of failing the commit. Only the tables
+        of the ingredients and tags of the recipe are checked.
+        """
+        try:
+            check_foreign_keys(tuple(REFERENCE_ERRORS))
+        except IntegrityError as error:
+            diag = getattr(error.__cause__, 'diag', None)
+            reference_error = REFERENCE_ERRORS.get(
+                getattr(diag, 'table_name', None))
+            if reference_error is None:
+                raise
+            field, message = reference_error
+            raise serializers.ValidationError({field: [message]})
+
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context['request'].user
         tags = validated_data.pop('tags')
@@ -169,17 +217,49 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.set(tags)
         add_ingredients_to_recipe(recipe, ingredients)
+        self.check_references()
+        enqueue('recipes.build_image_variants', recipe_id=recipe.id)
         return recipe
 
+    @transaction.atomic
     def update(self, instance: Recipe, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
+        # set() only adds and removes the tags that differ
         instance.tags.set(tags)
-        # Delete all the old ingredients for the current recipe
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        # Create the new ingredients for the current recipe
-        add_ingredients_to_recipe(instance, ingredients)
-        return super().update(instance, validated_data)
+        deltas = update_recipe_ingredients(instance, ingredients)
+        self.check_references()
+        # Carry the changed amounts over to the shopping lists
+        shopping_list.change_recipe(instance.id, deltas)
+        instance = super().update(instance, validated_data)
+        if 'image' in validated_data:
+            enqueue('recipes.build_image_variants', recipe_id=instance.id)
+        return instance
 
     def to_representation(self, instance):
+        # Load the nested rows in bulk, as RecipeViewSet does for reads
+        prefetch_related_objects(
+            [instance], 'tags',
+            Prefetch('recipe_ingredients',
+                     queryset=RecipeIngredient.objects
+                     .select_related('ingredient'))
+        )
         return RecipeGetSerializer(instance, context=self.context).data
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'name', 'status', 'attempts', 'result', 'error',
+                  'created', 'updated']
+
+
+class IdListSerializer(serializers.Serializer):
+    """Request body of the bulk endpoints: {"ids": [1, 2, 3]}"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1),
+                                allow_empty=False,
+                                max_length=BULK_IDS_MAX_LENGTH)
+
+    def validate_ids(self, value):
+        # Drop the repeated ids, keeping the order
+        return list(dict.fromkeys(value))
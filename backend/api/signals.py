@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from authors.models import CustomUserSubscribe
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.signals import ingredients_loaded
+
+from .cache import (cart_ids, favorite_ids, ingredients_catalogue,
+                    recipes_feed_cache, subscribed_ids, tags_catalogue)
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(ingredients_loaded, sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    ingredients_catalogue.bump()
+    recipes_feed_cache.bump()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(sender, **kwargs):
+    tags_catalogue.bump()
+    recipes_feed_cache.bump()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipes_changed(sender, **kwargs):
+    recipes_feed_cache.bump()
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, update_fields=None, **kwargs):
+    # Logging in only updates last_login, which the feed does not show
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        recipes_feed_cache.bump()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def favorites_changed(sender, instance, **kwargs):
+    favorite_ids.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    cart_ids.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=CustomUserSubscribe)
+@receiver(post_delete, sender=CustomUserSubscribe)
+def subscriptions_changed(sender, instance, **kwargs):
+    subscribed_ids.invalidate(instance.user_id)
@@ -0,0 +1,41 @@
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from jobs.runner import enqueue, task
+
+from .constants import SHOPPING_LIST_EXPORT_LIFETIME, SHOPPING_LIST_FILENAME
+from .exports import EXPORT_FORMATS, shopping_list_rows
+
+
+@task('api.export_shopping_list')
+def export_shopping_list(user_id: int, file_format: str) -> dict:
+    """
+    Render the shopping list of a user into a file in the media storage.
+
+    The file is public to whoever has its unguessable URL, and is deleted
+    after SHOPPING_LIST_EXPORT_LIFETIME seconds.
+    """
+    export_format = EXPORT_FORMATS[file_format]
+    with tempfile.TemporaryFile() as file:
+        for chunk in export_format.render(shopping_list_rows(user_id)):
+            file.write(chunk.encode())
+        file.seek(0)
+        name = default_storage.save(
+            f'exports/{SHOPPING_LIST_FILENAME}_{uuid.uuid4().hex}.'
+            f'{export_format.extension}',
+            File(file)
+        )
+    expires = timezone.now() + timedelta(
+        seconds=SHOPPING_LIST_EXPORT_LIFETIME)
+    enqueue('api.delete_export', run_after=expires, path=name)
+    return {'url': default_storage.url(name), 'expires': expires.isoformat()}
+
+
+@task('api.delete_export')
+def delete_export(path: str) -> None:
+    default_storage.delete(path)
@@ -0,0 +1,8 @@
+from django.urls import include, path
+
+from api.urls import async_urlpatterns, urlpatterns
+
+# The API with the async read views, whatever ASYNC_READ_VIEWS says
+urlpatterns = [
+    path('api/', include(async_urlpatterns + urlpatterns)),
+]
@@ -0,0 +1,90 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.db import connections
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+
+from api.exports import EXPORT_FORMATS
+from recipes.models import Favorite, Ingredient, ShoppingCart, Tag
+
+from .utils import TEST_SETTINGS, clear_caches, create_recipes, create_user
+
+
+@override_settings(**TEST_SETTINGS)
+class AsyncReadViewsTest(TestCase):
+    """The async read views answer as the sync views do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.recipes = create_recipes(create_user('author'), 3)
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+        token = Token.objects.create(user=cls.user)
+        cls.auth = {'Authorization': f'Token {token.key}'}
+        cls.tag = Tag.objects.get()
+        cls.ingredient = Ingredient.objects.get()
+
+    def get_sync(self, path: str, headers: dict):
+        # Nothing is left in the caches for the async view to reuse
+        clear_caches()
+        response = self.client.get(path, headers=headers)
+        if response.streaming:
+            return response, b''.join(response.streaming_content)
+        return response, response.content
+
+    def get_async(self, path: str, headers: dict):
+        clear_caches()
+        # The async views close the connection of the request, which holds
+        # the transaction of the test here
+        with override_settings(ROOT_URLCONF='api.tests.async_urls'), \
+                mock.patch.object(connections, 'close_all'):
+            response = async_to_sync(self.async_client.get)(path,
+                                                            headers=headers)
+        # Served by the async view, not handed over to the router one
+        self.assertNotIsInstance(response, Response)
+        self.assertFalse(response.streaming)
+        return response, response.content
+
+    def assert_same_response(self, path: str, authenticated: bool = False):
+        headers = self.auth if authenticated else {}
+        with self.subTest(path=path, authenticated=authenticated):
+            sync_response, sync_content = self.get_sync(path, headers)
+            async_response, async_content = self.get_async(path, headers)
+            self.assertEqual(sync_response.status_code, 200)
+            self.assertEqual(async_response.status_code, 200)
+            self.assertEqual(async_content, sync_content)
+            for header in ('Content-Type', 'Content-Disposition', 'ETag'):
+                self.assertEqual(async_response.get(header),
+                                 sync_response.get(header))
+
+    def test_recipe_list(self):
+        for authenticated in (False, True):
+            self.assert_same_response('/api/recipes/', authenticated)
+            self.assert_same_response('/api/recipes/?page=2&limit=2',
+                                      authenticated)
+            self.assert_same_response('/api/recipes/?tags=breakfast',
+                                      authenticated)
+        self.assert_same_response('/api/recipes/?is_favorited=1', True)
+
+    def test_recipe_detail(self):
+        path = f'/api/recipes/{self.recipes[0].id}/'
+        self.assert_same_response(path)
+        self.assert_same_response(path, authenticated=True)
+
+    def test_tags(self):
+        self.assert_same_response('/api/tags/')
+        self.assert_same_response(f'/api/tags/{self.tag.id}/')
+
+    def test_ingredients(self):
+        self.assert_same_response('/api/ingredients/')
+        self.assert_same_response('/api/ingredients/?name=яй')
+        self.assert_same_response(f'/api/ingredients/{self.ingredient.id}/')
+
+    def test_shopping_list(self):
+        for export_format in EXPORT_FORMATS:
+            self.assert_same_response(
+                '/api/recipes/download_shopping_cart/'
+                f'?file_format={export_format}', authenticated=True)
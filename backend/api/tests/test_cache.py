@@ -0,0 +1,81 @@
+import threading
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.cache import FeedCache
+
+from .utils import TEST_SETTINGS, clear_caches
+
+
+@override_settings(**TEST_SETTINGS)
+class FeedCacheTest(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.feed_cache = FeedCache('test', timeout=60, max_page=5)
+        self.request = Request(APIRequestFactory().get('/api/recipes/'))
+
+    def test_generation_never_reused(self):
+        keys = {self.feed_cache.key(self.request)}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.feed_cache.bump()
+        keys.add(self.feed_cache.key(self.request))
+        # Evicted, the generation key starts over with a new value
+        cache.delete(self.feed_cache.generation_key)
+        keys.add(self.feed_cache.key(self.request))
+        self.assertEqual(len(keys), 3)
+
+    def test_page_built_once(self):
+        computed = []
+
+        def compute():
+            computed.append(1)
+            return {'results': []}
+
+        self.assertEqual(self.feed_cache.get_or_set(self.request, compute),
+                         {'results': []})
+        self.feed_cache.get_or_set(self.request, compute)
+        self.assertEqual(len(computed), 1)
+
+    def test_waits_for_the_lock_holder(self):
+        key = self.feed_cache.key(self.request)
+        # Another worker is building the page
+        self.feed_cache.pages.add(f'{key}:lock', 1)
+        threading.Timer(0.2, self.feed_cache.pages.set,
+                        args=(key, {'results': ['built']})).start()
+        data = self.feed_cache.get_or_set(self.request, lambda: None)
+        self.assertEqual(data, {'results': ['built']})
+
+    def test_lock_released_when_build_fails(self):
+        def compute():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            self.feed_cache.get_or_set(self.request, compute)
+        key = self.feed_cache.key(self.request)
+        self.assertTrue(self.feed_cache.pages.add(f'{key}:lock', 1))
+
+    async def test_async_page_built_once(self):
+        computed = []
+
+        async def compute():
+            computed.append(1)
+            return {'results': []}
+
+        self.assertEqual(
+            await self.feed_cache.aget_or_set(self.request, compute),
+            {'results': []})
+        await self.feed_cache.aget_or_set(self.request, compute)
+        self.assertEqual(len(computed), 1)
+
+    async def test_async_lock_released_when_build_fails(self):
+        async def compute():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            await self.feed_cache.aget_or_set(self.request, compute)
+        key = self.feed_cache.key(self.request)
+        self.assertTrue(self.feed_cache.pages.add(f'{key}:lock', 1))
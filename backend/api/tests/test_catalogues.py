@@ -0,0 +1,140 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from api.constants import INGREDIENTS_AUTOCOMPLETE_LIMIT
+from recipes.models import Ingredient, Tag
+
+from .utils import TEST_SETTINGS, clear_caches
+
+INGREDIENTS_URL = '/api/ingredients/'
+TAGS_URL = '/api/tags/'
+AUTOCOMPLETE_URL = f'{INGREDIENTS_URL}autocomplete/'
+
+
+@override_settings(**TEST_SETTINGS)
+class IngredientAutocompleteTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Сыр {number:02}', measurement_unit='г')
+            for number in reversed(range(INGREDIENTS_AUTOCOMPLETE_LIMIT + 5)))
+        Ingredient.objects.create(name='сырок', measurement_unit='шт')
+        Ingredient.objects.create(name='Творог', measurement_unit='г')
+
+    def setUp(self):
+        clear_caches()
+
+    def names(self, query: str) -> list[str]:
+        response = self.client.get(f'{AUTOCOMPLETE_URL}?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()]
+
+    def test_prefix(self):
+        self.assertEqual(self.names('name=СЫРО'), ['сырок'])
+        self.assertEqual(self.names('name=тв'), ['Творог'])
+        self.assertEqual(self.names('name=Молоко'), [])
+        self.assertEqual(self.names('name='), [])
+
+    def test_limit(self):
+        expected = [f'Сыр {number:02}' for number in range(20)] + ['сырок']
+        self.assertEqual(self.names('name=сыр'),
+                         expected[:INGREDIENTS_AUTOCOMPLETE_LIMIT])
+        self.assertEqual(self.names('name=сыр&limit=3'), expected[:3])
+        self.assertEqual(self.names('name=сыр&limit=x'),
+                         expected[:INGREDIENTS_AUTOCOMPLETE_LIMIT])
+        with mock.patch('api.views.INGREDIENTS_AUTOCOMPLETE_MAX_LIMIT', 12):
+            self.assertEqual(self.names('name=сыр&limit=100'),
+                             expected[:12])
+
+    def test_no_queries_once_cached(self):
+        self.names('name=сыр')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.names('name=с&limit=100')), 16)
+
+    def test_new_ingredient(self):
+        self.names('name=сыр')
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Сыр рикотта',
+                                      measurement_unit='г')
+        self.assertIn('Сыр рикотта', self.names('name=сыр р'))
+
+
+@override_settings(**TEST_SETTINGS)
+class CatalogueETagTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast',
+                                     color='#E26C2D')
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        Ingredient.objects.create(name='Сахар', measurement_unit='г')
+
+    def setUp(self):
+        clear_caches()
+
+    def get(self, url: str, etag: str = None):
+        headers = {} if etag is None else {'If-None-Match': etag}
+        return self.client.get(url, headers=headers)
+
+    def test_not_modified(self):
+        for url in (TAGS_URL, f'{TAGS_URL}{self.tag.id}/', INGREDIENTS_URL,
+                    f'{INGREDIENTS_URL}?name=са'):
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+                with self.assertNumQueries(0):
+                    for if_none_match in (etag, f'"other", {etag}', '*'):
+                        response = self.get(url, if_none_match)
+                        self.assertEqual(response.status_code, 304)
+                        self.assertEqual(response.content, b'')
+                        self.assertEqual(response['ETag'], etag)
+                self.assertEqual(self.get(url, '"other"').status_code, 200)
+
+    def test_filtered_etag(self):
+        etags = {self.get(f'{INGREDIENTS_URL}{query}')['ETag']
+                 for query in ('', '?name=са', '?name=со')}
+        self.assertEqual(len(etags), 3)
+
+    def test_version_bump(self):
+        response = self.get(TAGS_URL)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Обед', slug='lunch', color='#49B64E')
+        response = self.get(TAGS_URL, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([tag['slug'] for tag in response.json()],
+                         ['breakfast', 'lunch'])
+        # Unchanged rows keep the ETag of their detail
+        response = self.get(f'{TAGS_URL}{self.tag.id}/')
+        detail_etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Ужин', slug='dinner', color='#8775D2')
+        self.assertEqual(
+            self.get(f'{TAGS_URL}{self.tag.id}/', detail_etag).status_code,
+            304)
+
+    def test_loaded_ingredients(self):
+        response = self.get(INGREDIENTS_URL)
+        etag = response['ETag']
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'ingredients.csv'
+            path.write_text('перец,г\n', encoding='utf-8')
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('add_ingredients', str(path),
+                             stdout=open('/dev/null', 'w'))
+        response = self.get(INGREDIENTS_URL, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('перец', [row['name'] for row in response.json()])
+
+    def test_missing_detail(self):
+        for url in (f'{TAGS_URL}0/', f'{TAGS_URL}x/',
+                    f'{INGREDIENTS_URL}{10 ** 9}/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url).status_code, 404)
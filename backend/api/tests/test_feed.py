@@ -0,0 +1,112 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from jobs.models import Job
+from recipes import feed
+from recipes.models import FeedEntry, Recipe
+
+from .utils import TEST_SETTINGS, clear_caches, create_recipes, create_user
+
+FEED_URL = '/api/recipes/feed/'
+USERS_URL = '/api/users/'
+
+
+@override_settings(**TEST_SETTINGS)
+class FeedTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.author = create_user('author')
+        cls.other_author = create_user('other_author')
+        create_recipes(cls.author, 3)
+        create_recipes(cls.other_author, 2)
+        create_recipes(create_user('unfollowed'), 2)
+
+    def setUp(self):
+        clear_caches()
+
+    def client_of(self, user) -> APIClient:
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def subscribe(self, user, author, method: str = 'post'):
+        request = getattr(self.client_of(user), method)
+        response = request(f'{USERS_URL}{author.id}/subscribe/')
+        self.assertIn(response.status_code, (201, 204))
+
+    def feed_ids(self, query: str = 'limit=100') -> list[int]:
+        response = self.client_of(self.user).get(f'{FEED_URL}?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    @staticmethod
+    def recipe_ids(*authors) -> list[int]:
+        return list(Recipe.objects.filter(author__in=authors)
+                    .values_list('id', flat=True))
+
+    def test_page_numbers(self):
+        self.subscribe(self.user, self.author)
+        self.subscribe(self.user, self.other_author)
+        # Published after the subscriptions, fanned out on write
+        new_recipe, = create_recipes(self.author, 1)
+        expected = self.recipe_ids(self.author, self.other_author)
+        self.assertEqual(expected[0], new_recipe.id)
+        response = self.client_of(self.user).get(f'{FEED_URL}?limit=4')
+        self.assertEqual(response.data['count'], len(expected))
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual([recipe['id'] for recipe
+                          in response.data['results']], expected[:4])
+        self.assertEqual(self.feed_ids('limit=4&page=2'), expected[4:])
+
+    def test_unsubscribe_prunes_timeline(self):
+        self.subscribe(self.user, self.author)
+        self.subscribe(self.user, self.other_author)
+        self.subscribe(self.user, self.author, 'delete')
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.user, author=self.author).exists())
+        self.assertEqual(self.feed_ids(),
+                         self.recipe_ids(self.other_author))
+
+    @mock.patch('recipes.feed.FEED_FANOUT_MAX_FOLLOWERS', 1)
+    def test_large_author_merged_on_read(self):
+        self.subscribe(self.user, self.other_author)
+        self.subscribe(create_user('fan'), self.author)
+        # The second follower: the author is no longer fanned out
+        self.subscribe(self.user, self.author)
+        create_recipes(self.author, 1)
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.user, author=self.author).exists())
+        self.assertEqual(feed.large_followed_authors(self.user.id),
+                         [self.author.id])
+        expected = self.recipe_ids(self.author, self.other_author)
+        self.assertEqual(self.feed_ids(), expected)
+        self.assertEqual(self.feed_ids('limit=3&page=2'), expected[3:6])
+
+    @mock.patch('recipes.feed.FEED_FANOUT_MAX_FOLLOWERS', 1)
+    def test_backfill_when_back_to_limit(self):
+        fans = [create_user(f'fan{number}') for number in range(2)]
+        self.subscribe(self.user, self.author)
+        for fan in fans:
+            self.subscribe(fan, self.author)
+        backfills = Job.objects.filter(name='recipes.backfill_feed')
+        # Three followers down to two, still above the limit
+        self.subscribe(fans[0], self.author, 'delete')
+        self.assertFalse(backfills.exists())
+        new_recipe, = create_recipes(self.author, 1)
+        # Two down to one, back to the limit
+        self.subscribe(fans[1], self.author, 'delete')
+        job = backfills.get()
+        self.assertEqual(job.payload, {'author_id': self.author.id})
+        # One down to none
+        self.subscribe(self.user, self.author, 'delete')
+        self.assertEqual(backfills.count(), 1)
+
+        self.subscribe(self.user, self.author)
+        FeedEntry.objects.filter(recipe=new_recipe).delete()
+        feed.backfill_followers(self.author.id)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, recipe=new_recipe).exists())
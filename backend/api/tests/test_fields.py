@@ -0,0 +1,75 @@
+import base64
+import os
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.test import SimpleTestCase, override_settings
+from rest_framework import serializers
+
+from api.fields import decode_base64_image
+from recipes.storage import ContentAddressedStorage
+
+CONTENT = bytes(range(256)) * 3
+
+
+def data_uri(payload: str) -> str:
+    return f'data:image/png;base64,{payload}'
+
+
+def wrapped(payload: str, width: int = 76) -> str:
+    """The payload split into lines, as MIME encoders write it."""
+    return '\r\n'.join(payload[start:start + width]
+                       for start in range(0, len(payload), width))
+
+
+@mock.patch('api.fields.BASE64_CHUNK_SIZE', 10)
+class DecodeBase64ImageTest(SimpleTestCase):
+    payload = base64.b64encode(CONTENT).decode()
+
+    def decode(self, data: str) -> bytes:
+        file = decode_base64_image(data)
+        try:
+            return file.read()
+        finally:
+            file.close()
+
+    def test_decode(self):
+        self.assertEqual(self.decode(data_uri(self.payload)), CONTENT)
+
+    def test_whitespace(self):
+        self.assertEqual(self.decode(data_uri(wrapped(self.payload))),
+                         CONTENT)
+        self.assertEqual(self.decode(data_uri(f' {self.payload}\n')),
+                         CONTENT)
+
+    def test_truncated(self):
+        with self.assertRaises(serializers.ValidationError):
+            decode_base64_image(data_uri(self.payload[:-1]))
+
+
+class ContentAddressedStorageTest(SimpleTestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.storage = ContentAddressedStorage()
+
+    def upload(self) -> TemporaryUploadedFile:
+        file = TemporaryUploadedFile(name='upload', content_type=None,
+                                     size=len(CONTENT), charset=None)
+        file.write(CONTENT)
+        file.seek(0)
+        return file
+
+    def test_duplicate_upload_released(self):
+        self.storage.save('image.png', self.upload())
+        duplicate = self.upload()
+        path = duplicate.temporary_file_path()
+        self.assertEqual(self.storage.save('image.png', duplicate),
+                         'image.png')
+        self.assertTrue(duplicate.closed)
+        self.assertFalse(os.path.exists(path))
+        with self.storage.open('image.png') as stored:
+            self.assertEqual(stored.read(), CONTENT)
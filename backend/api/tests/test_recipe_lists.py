@@ -0,0 +1,247 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.constants import BULK_IDS_MAX_LENGTH
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem)
+
+from .utils import (TEST_SETTINGS, assert_consistent, clear_caches,
+                    create_recipes, create_user)
+
+RECIPES_URL = '/api/recipes/'
+MISSING_ID = 10 ** 9
+
+
+@override_settings(**TEST_SETTINGS)
+class RecipeListsTest(TestCase):
+    """
+    The favorites and the shopping cart, changed by statements that do the
+    work of the model receivers themselves.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.recipes = create_recipes(create_user('author'), 2)
+        # Eggs: 1 in the first recipe, 2 in the second; salt: first only
+        cls.egg = Ingredient.objects.get()
+        cls.salt = Ingredient.objects.create(name='Соль',
+                                             measurement_unit='г')
+        RecipeIngredient.objects.create(recipe=cls.recipes[0],
+                                        ingredient=cls.salt, amount=5)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def change(self, method: str, recipe_id, url_path: str):
+        request = getattr(self.client, method)
+        # The cached id sets of the user are dropped on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return request(f'{RECIPES_URL}{recipe_id}/{url_path}/')
+
+    def counters(self, recipe: Recipe) -> tuple[int, int]:
+        recipe.refresh_from_db()
+        return recipe.favorites_count, recipe.in_carts_count
+
+    def items(self) -> dict[str, int]:
+        return dict(ShoppingListItem.objects.filter(user=self.user)
+                    .values_list('ingredient__name', 'amount'))
+
+    def flags(self, recipe: Recipe) -> dict[str, bool]:
+        """Flags of the recipe in the cached list page."""
+        response = self.client.get(RECIPES_URL)
+        row, = [row for row in response.data['results']
+                if row['id'] == recipe.id]
+        return {'is_favorited': row['is_favorited'],
+                'is_in_shopping_cart': row['is_in_shopping_cart']}
+
+    def test_favorite(self):
+        recipe = self.recipes[0]
+        self.client.get(RECIPES_URL)
+        response = self.change('post', recipe.id, 'favorite')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['id'], recipe.id)
+        self.assertEqual(response.json()['name'], recipe.name)
+        self.assertEqual(self.counters(recipe), (1, 0))
+        self.assertTrue(self.flags(recipe)['is_favorited'])
+        self.assertEqual(self.change('post', recipe.id,
+                                     'favorite').status_code, 400)
+        self.assertEqual(self.counters(recipe), (1, 0))
+        assert_consistent(self)
+
+        self.assertEqual(self.change('delete', recipe.id,
+                                     'favorite').status_code, 204)
+        self.assertEqual(self.counters(recipe), (0, 0))
+        self.assertFalse(self.flags(recipe)['is_favorited'])
+        self.assertEqual(self.change('delete', recipe.id,
+                                     'favorite').status_code, 400)
+        self.assertEqual(self.counters(recipe), (0, 0))
+        assert_consistent(self)
+
+    def test_shopping_cart(self):
+        first, second = self.recipes
+        self.client.get(RECIPES_URL)
+        self.assertEqual(self.change('post', first.id,
+                                     'shopping_cart').status_code, 201)
+        self.assertEqual(self.items(), {'Яйцо': 1, 'Соль': 5})
+        self.assertTrue(self.flags(first)['is_in_shopping_cart'])
+        self.assertEqual(self.change('post', second.id,
+                                     'shopping_cart').status_code, 201)
+        self.assertEqual(self.items(), {'Яйцо': 3, 'Соль': 5})
+        self.assertEqual(self.change('post', second.id,
+                                     'shopping_cart').status_code, 400)
+        self.assertEqual(self.items(), {'Яйцо': 3, 'Соль': 5})
+        self.assertEqual(self.counters(second), (0, 1))
+        assert_consistent(self)
+
+        # Salt drops to zero and is deleted, eggs are lowered
+        self.assertEqual(self.change('delete', first.id,
+                                     'shopping_cart').status_code, 204)
+        self.assertEqual(self.items(), {'Яйцо': 2})
+        self.assertEqual(self.counters(first), (0, 0))
+        self.assertFalse(self.flags(first)['is_in_shopping_cart'])
+        assert_consistent(self)
+        self.assertEqual(self.change('delete', second.id,
+                                     'shopping_cart').status_code, 204)
+        self.assertEqual(self.items(), {})
+        self.assertEqual(self.change('delete', second.id,
+                                     'shopping_cart').status_code, 400)
+        assert_consistent(self)
+
+    def test_missing_recipe(self):
+        for url_path in ('favorite', 'shopping_cart'):
+            for method in ('post', 'delete'):
+                for recipe_id in (MISSING_ID, 'abc'):
+                    with self.subTest(url_path=url_path, method=method,
+                                      recipe_id=recipe_id):
+                        response = self.change(method, recipe_id, url_path)
+                        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Favorite.objects.exists())
+        self.assertFalse(ShoppingCart.objects.exists())
+
+    def test_same_as_model_receivers(self):
+        """
+        The statements leave the counters and the shopping lists as the
+        receivers of the model signals do.
+        """
+        first, second = self.recipes
+        other = create_user('other')
+        for recipe in self.recipes:
+            self.change('post', recipe.id, 'favorite')
+            self.change('post', recipe.id, 'shopping_cart')
+            Favorite.objects.create(user=other, recipe=recipe)
+            ShoppingCart.objects.create(user=other, recipe=recipe)
+        self.assertEqual(self.counters(first), (2, 2))
+        assert_consistent(self)
+        self.change('delete', first.id, 'favorite')
+        self.change('delete', first.id, 'shopping_cart')
+        Favorite.objects.get(user=other, recipe=second).delete()
+        ShoppingCart.objects.get(user=other, recipe=second).delete()
+        self.assertEqual(self.counters(first), (1, 1))
+        self.assertEqual(self.counters(second), (1, 1))
+        self.assertEqual(self.items(), {'Яйцо': 2})
+        assert_consistent(self)
+        # A deleted recipe leaves both carts through the cascade
+        second.delete()
+        first.delete()
+        self.assertFalse(ShoppingListItem.objects.exists())
+        assert_consistent(self)
+
+
+@override_settings(**TEST_SETTINGS)
+class BulkRecipeListsTest(TestCase):
+    """The favorites and the shopping cart changed many recipes at once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.recipes = create_recipes(create_user('author'), 12)
+        cls.ids = [recipe.id for recipe in cls.recipes]
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def change(self, method: str, url_path: str, ids: list) -> list[dict]:
+        request = getattr(self.client, method)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = request(f'{RECIPES_URL}{url_path}/', {'ids': ids},
+                               format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def counters(self) -> list[tuple[int, int]]:
+        return list(Recipe.objects.filter(id__in=self.ids[:3])
+                    .order_by('id')
+                    .values_list('favorites_count', 'in_carts_count'))
+
+    def test_favorites(self):
+        first, second, third = self.ids[:3]
+        self.change('post', 'favorite', [second])
+        results = self.change('post', 'favorite',
+                              [first, second, first, MISSING_ID])
+        self.assertEqual(results, [
+            {'id': first, 'status': 'added'},
+            {'id': second, 'status': 'already_added'},
+            {'id': MISSING_ID, 'status': 'not_found'},
+        ])
+        self.assertEqual(self.counters(), [(1, 0), (1, 0), (0, 0)])
+        results = self.change('delete', 'favorite',
+                              [second, third, second, MISSING_ID])
+        self.assertEqual(results, [
+            {'id': second, 'status': 'removed'},
+            {'id': third, 'status': 'not_in_list'},
+            {'id': MISSING_ID, 'status': 'not_found'},
+        ])
+        self.assertEqual(self.counters(), [(1, 0), (0, 0), (0, 0)])
+        assert_consistent(self)
+
+    def test_shopping_cart(self):
+        first, second, third = self.ids[:3]
+        # Eggs: 1, 2 and 3 in the first three recipes
+        results = self.change('post', 'shopping_cart',
+                              [first, second, third])
+        self.assertEqual([result['status'] for result in results],
+                         ['added'] * 3)
+        self.assertEqual(ShoppingListItem.objects.get(user=self.user).amount,
+                         6)
+        self.assertEqual(self.counters(), [(0, 1), (0, 1), (0, 1)])
+        self.change('delete', 'shopping_cart', [first, third])
+        self.assertEqual(ShoppingListItem.objects.get(user=self.user).amount,
+                         2)
+        self.assertEqual(self.counters(), [(0, 0), (0, 1), (0, 0)])
+        assert_consistent(self)
+        self.change('delete', 'shopping_cart', [second])
+        self.assertFalse(ShoppingListItem.objects.exists())
+        assert_consistent(self)
+
+    def test_too_many_ids(self):
+        for url_path in ('favorite', 'shopping_cart'):
+            with self.subTest(url_path=url_path):
+                response = self.client.post(
+                    f'{RECIPES_URL}{url_path}/',
+                    {'ids': list(range(1, BULK_IDS_MAX_LENGTH + 2))},
+                    format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ids', response.data)
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_constant_queries(self):
+        """A batch runs as many queries whatever its size."""
+        for url_path in ('favorite', 'shopping_cart'):
+            for method in ('post', 'delete'):
+                with self.subTest(url_path=url_path, method=method):
+                    with CaptureQueriesContext(connection) as one:
+                        self.change(method, url_path,
+                                    [self.ids[0], MISSING_ID])
+                    with self.assertNumQueries(len(one)):
+                        self.change(method, url_path,
+                                    self.ids[1:] + [MISSING_ID])
+                    # The statement in a savepoint and the missing ids
+                    self.assertEqual(len(one), 4)
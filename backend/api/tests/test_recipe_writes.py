@@ -0,0 +1,255 @@
+import base64
+import hashlib
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.cache import ingredients_catalogue, tags_catalogue
+from jobs.models import Job
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem, Tag)
+
+from .utils import (TEST_SETTINGS, assert_consistent, clear_caches,
+                    create_recipes, create_user)
+
+RECIPES_URL = '/api/recipes/'
+MISSING_ID = 10 ** 9
+
+
+def png(color: str) -> bytes:
+    output = BytesIO()
+    Image.new('RGB', (2, 2), color).save(output, 'PNG')
+    return output.getvalue()
+
+
+class RecipeWriteTestCase(TestCase):
+    """Recipes edited through the API by their author."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        # Eggs: 1 in the first recipe, 2 in the second; salt: first only
+        cls.recipes = create_recipes(cls.author, 2)
+        cls.egg = Ingredient.objects.get()
+        cls.salt = Ingredient.objects.create(name='Соль',
+                                             measurement_unit='г')
+        cls.pepper = Ingredient.objects.create(name='Перец',
+                                               measurement_unit='г')
+        RecipeIngredient.objects.create(recipe=cls.recipes[0],
+                                        ingredient=cls.salt, amount=5)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def edit(self, recipe: Recipe, amounts: dict[Ingredient, int],
+             **fields):
+        """PATCH the recipe with its current image and tags."""
+        data = {'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'image': recipe.image.url,
+                'tags': [tag.id for tag in recipe.tags.all()],
+                'ingredients': [{'id': ingredient.id, 'amount': amount}
+                                for ingredient, amount in amounts.items()],
+                **fields}
+        return self.client.patch(f'{RECIPES_URL}{recipe.id}/', data,
+                                 format='json')
+
+
+@override_settings(**TEST_SETTINGS)
+class RecipeEditShoppingListsTest(RecipeWriteTestCase):
+    """Edits of a recipe carried over to the carts holding it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.buyers = [create_user(f'buyer{number}') for number in range(2)]
+        for recipe in cls.recipes:
+            ShoppingCart.objects.create(user=cls.buyers[0], recipe=recipe)
+        ShoppingCart.objects.create(user=cls.buyers[1],
+                                    recipe=cls.recipes[0])
+
+    def items(self) -> list[dict[str, int]]:
+        return [dict(ShoppingListItem.objects.filter(user=buyer)
+                     .values_list('ingredient__name', 'amount'))
+                for buyer in self.buyers]
+
+    def test_edit(self):
+        self.assertEqual(self.items(), [{'Яйцо': 3, 'Соль': 5},
+                                        {'Яйцо': 1, 'Соль': 5}])
+        response = self.edit(self.recipes[0],
+                             {self.egg: 4, self.pepper: 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.items(), [{'Яйцо': 6, 'Перец': 2},
+                                        {'Яйцо': 4, 'Перец': 2}])
+        assert_consistent(self)
+        response = self.edit(self.recipes[1], {self.egg: 1, self.salt: 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.items(), [{'Яйцо': 5, 'Перец': 2, 'Соль': 3},
+                                        {'Яйцо': 4, 'Перец': 2}])
+        assert_consistent(self)
+
+    def test_unchanged_amounts(self):
+        response = self.edit(self.recipes[0], {self.salt: 5, self.egg: 1},
+                             name='Омлет')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.items(), [{'Яйцо': 3, 'Соль': 5},
+                                        {'Яйцо': 1, 'Соль': 5}])
+        assert_consistent(self)
+
+    def test_delete_recipe(self):
+        response = self.client.delete(f'{RECIPES_URL}{self.recipes[0].id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.items(), [{'Яйцо': 2}, {}])
+        assert_consistent(self)
+
+    def test_delete_ingredient(self):
+        self.salt.delete()
+        self.assertEqual(self.items(), [{'Яйцо': 3}, {'Яйцо': 1}])
+        assert_consistent(self)
+
+
+@override_settings(**TEST_SETTINGS)
+class RecipeDiffUpdateTest(RecipeWriteTestCase):
+    """An edit only writes the ingredients and the image that changed."""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    def rows(self, recipe: Recipe) -> dict[int, tuple[int, int]]:
+        """{ingredient id: (row id, amount)} of the recipe."""
+        return {row.ingredient_id: (row.id, row.amount)
+                for row in RecipeIngredient.objects.filter(recipe=recipe)}
+
+    def test_ingredients(self):
+        recipe = self.recipes[0]
+        rows = self.rows(recipe)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.edit(recipe, {self.egg: 1, self.salt: 7,
+                                          self.pepper: 2})
+        self.assertEqual(response.status_code, 200)
+        new_rows = self.rows(recipe)
+        # The unchanged and the changed rows are kept
+        self.assertEqual(new_rows[self.egg.id], rows[self.egg.id])
+        self.assertEqual(new_rows[self.salt.id],
+                         (rows[self.salt.id][0], 7))
+        self.assertEqual(new_rows[self.pepper.id][1], 2)
+        writes = [query['sql'] for query in queries
+                  if RecipeIngredient._meta.db_table in query['sql']
+                  and query['sql'].startswith(('INSERT', 'UPDATE',
+                                               'DELETE'))]
+        self.assertEqual(len(writes), 2)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+        self.assertTrue(writes[1].startswith('INSERT'))
+
+        response = self.edit(recipe, {self.pepper: 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rows(recipe),
+                         {self.pepper.id: new_rows[self.pepper.id]})
+        self.assertEqual([row['amount'] for row in
+                          response.data['ingredients']], [2])
+
+    def test_unchanged_image(self):
+        recipe = self.recipes[0]
+        content = png('red')
+        name = f'recipes/images/{hashlib.sha256(content).hexdigest()}.png'
+        Recipe.objects.filter(id=recipe.id).update(image=name)
+        recipe.refresh_from_db()
+        jobs = Job.objects.filter(name='recipes.build_image_variants')
+        for image in (recipe.image.url,
+                      f'http://testserver{recipe.image.url}',
+                      'data:image/png;base64,'
+                      + base64.b64encode(content).decode()):
+            with self.subTest(image=image[:30]):
+                response = self.edit(recipe, {self.egg: 1}, image=image)
+                self.assertEqual(response.status_code, 200)
+                recipe.refresh_from_db()
+                self.assertEqual(recipe.image.name, name)
+                self.assertFalse(jobs.exists())
+
+        response = self.edit(recipe, {self.egg: 1},
+                             image='data:image/png;base64,'
+                             + base64.b64encode(png('blue')).decode())
+        self.assertEqual(response.status_code, 200)
+        recipe.refresh_from_db()
+        self.assertNotEqual(recipe.image.name, name)
+        self.assertEqual(jobs.get().payload, {'recipe_id': recipe.id})
+
+
+@override_settings(**TEST_SETTINGS)
+class RecipeReferencesTest(RecipeWriteTestCase):
+    """Ingredient and tag ids checked against the cached catalogues."""
+
+    def test_missing_ids(self):
+        self.assertEqual(ingredients_catalogue.missing_ids(
+            [self.egg.id, MISSING_ID]), {MISSING_ID})
+        # Not in the cached copy yet, found by the query
+        sugar = Ingredient.objects.create(name='Сахар', measurement_unit='г')
+        with self.assertNumQueries(1):
+            self.assertEqual(ingredients_catalogue.missing_ids(
+                [self.egg.id, sugar.id, MISSING_ID]), {MISSING_ID})
+        tag_ids = [Tag.objects.get().id]
+        tags_catalogue.get()
+        with self.assertNumQueries(0):
+            self.assertEqual(tags_catalogue.missing_ids(tag_ids), set())
+
+    def test_missing_references(self):
+        recipe = self.recipes[0]
+        ingredients = RecipeIngredient.objects.filter(recipe=recipe)
+        amounts = list(ingredients.values_list('ingredient_id', 'amount'))
+        for fields, errors in (
+                ({'ingredients': [{'id': MISSING_ID, 'amount': 1}]},
+                 {'ingredients': ['Non existing ingredient!']}),
+                ({'tags': [MISSING_ID]}, {'tags': ['Non existing tag!']})):
+            with self.subTest(fields=fields):
+                response = self.edit(recipe, {self.egg: 1}, **fields)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), errors)
+                self.assertEqual(
+                    list(ingredients.values_list('ingredient_id',
+                                                 'amount')),
+                    amounts)
+
+    def test_deleted_after_validation(self):
+        """Rows gone once validated fail the deferred foreign keys."""
+        recipe = self.recipes[0]
+        for catalogue, fields, errors in (
+                (ingredients_catalogue,
+                 {'ingredients': [{'id': MISSING_ID, 'amount': 1}]},
+                 {'ingredients': ['Non existing ingredient!']}),
+                (tags_catalogue, {'tags': [MISSING_ID]},
+                 {'tags': ['Non existing tag!']})):
+            with self.subTest(fields=fields), \
+                    mock.patch.object(catalogue, 'missing_ids',
+                                      return_value=set()):
+                response = self.edit(recipe, {self.egg: 1}, **fields)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), errors)
+        self.assertEqual(recipe.recipe_ingredients.count(), 2)
+        self.assertEqual(recipe.tags.count(), 1)
+
+    def test_other_tables_left_to_commit(self):
+        # A row of another table breaking its deferred foreign key
+        Favorite.objects.create(user=self.author, recipe_id=MISSING_ID)
+        try:
+            response = self.edit(self.recipes[0], {self.egg: 2})
+            self.assertEqual(response.status_code, 200)
+        finally:
+            Favorite.objects.filter(recipe_id=MISSING_ID).delete()
+
+    def test_other_errors_raised(self):
+        with mock.patch('api.serializers.check_foreign_keys',
+                        side_effect=IntegrityError), \
+                self.assertRaises(IntegrityError):
+            self.edit(self.recipes[0], {self.egg: 2})
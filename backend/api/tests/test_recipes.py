@@ -0,0 +1,338 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+
+from .utils import TEST_SETTINGS, clear_caches, create_recipes, create_user
+
+RECIPES = 12
+RECIPES_URL = '/api/recipes/'
+
+
+@override_settings(**TEST_SETTINGS)
+class RecipeListQueriesTest(TestCase):
+    """The recipe list runs as many queries whatever the page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        recipes = create_recipes(create_user('author'), RECIPES)
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes)
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe=recipe)
+            for recipe in recipes[::2])
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_page(self, query: str, size: int):
+        clear_caches()
+        response = self.client.get(f'{RECIPES_URL}?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), size)
+        return response
+
+    def assert_constant_queries(self, query: str):
+        with CaptureQueriesContext(connection) as small_page:
+            self.get_page(f'limit=2&{query}', 2)
+        with self.assertNumQueries(len(small_page)):
+            self.get_page(f'limit=100&{query}', RECIPES)
+
+    def test_feed_page(self):
+        self.assert_constant_queries('')
+
+    def test_private_page(self):
+        # Not cached: the flags come from the EXISTS annotations
+        self.assert_constant_queries('is_favorited=1')
+
+    def test_private_page_flags(self):
+        response = self.get_page('limit=100&is_favorited=1', RECIPES)
+        in_cart = [recipe['is_in_shopping_cart']
+                   for recipe in response.data['results']]
+        self.assertTrue(all(recipe['is_favorited']
+                            for recipe in response.data['results']))
+        self.assertEqual(in_cart.count(True), (RECIPES + 1) // 2)
+
+
+@override_settings(**TEST_SETTINGS)
+class RecipeIngredientsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = create_recipes(create_user('author'), 2)
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        RecipeIngredient.objects.create(recipe=cls.recipes[0],
+                                        ingredient=salt, amount=5)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_amounts(self):
+        egg, salt = Ingredient.objects.order_by('id')
+        expected = {
+            self.recipes[0].id: [
+                {'id': egg.id, 'name': 'Яйцо', 'measurement_unit': 'шт',
+                 'amount': 1},
+                {'id': salt.id, 'name': 'Соль', 'measurement_unit': 'г',
+                 'amount': 5}],
+            self.recipes[1].id: [
+                {'id': egg.id, 'name': 'Яйцо', 'measurement_unit': 'шт',
+                 'amount': 2}],
+        }
+        response = self.client.get(RECIPES_URL)
+        ingredients = {recipe['id']: sorted(recipe['ingredients'],
+                                            key=lambda row: row['id'])
+                       for recipe in response.data['results']}
+        self.assertEqual(ingredients, expected)
+        recipe_id = self.recipes[0].id
+        response = self.client.get(f'{RECIPES_URL}{recipe_id}/')
+        self.assertCountEqual(response.data['ingredients'],
+                              expected[recipe_id])
+
+    def test_one_query_per_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(RECIPES_URL)
+        ingredient_queries = [
+            query['sql'] for query in queries
+            if RecipeIngredient._meta.db_table in query['sql']]
+        # The through rows of the page with their ingredients joined
+        self.assertEqual(len(ingredient_queries), 1)
+        self.assertIn(f'JOIN "{Ingredient._meta.db_table}"',
+                      ingredient_queries[0])
+
+
+@override_settings(**TEST_SETTINGS)
+class RecipeOverlayTest(TestCase):
+    """Users share the cached page, each with their own flags."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.recipes = create_recipes(cls.author, 3)
+        cls.users = [create_user(f'reader{number}') for number in range(2)]
+        first, second = cls.users
+        Favorite.objects.create(user=first, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=first, recipe=cls.recipes[1])
+        first.subscriptions.add(cls.author)
+        Favorite.objects.create(user=second, recipe=cls.recipes[2])
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def get_flags(self, user=None, query: str = '') -> dict[int, tuple]:
+        self.client.force_authenticate(user)
+        response = self.client.get(f'{RECIPES_URL}?{query}')
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id']: (recipe['is_favorited'],
+                               recipe['is_in_shopping_cart'],
+                               recipe['author']['is_subscribed'])
+                for recipe in response.data['results']}
+
+    def test_flags(self):
+        first, second, third = (recipe.id for recipe in self.recipes)
+        anonymous = {recipe_id: (False, False, False)
+                     for recipe_id in (first, second, third)}
+        self.assertEqual(self.get_flags(), anonymous)
+        self.assertEqual(self.get_flags(self.users[0]), {
+            first: (True, False, True),
+            second: (False, True, True),
+            third: (False, False, True)})
+        with CaptureQueriesContext(connection) as queries:
+            flags = self.get_flags(self.users[1])
+        self.assertEqual(flags, {first: (False, False, False),
+                                 second: (False, False, False),
+                                 third: (True, False, False)})
+        # The body comes from the cache, only the id sets are read
+        self.assertFalse([query for query in queries
+                          if f'FROM "{Recipe._meta.db_table}"'
+                          in query['sql']])
+        # The cached body is left as anonymous visitors see it
+        self.assertEqual(self.get_flags(), anonymous)
+
+    def test_private_params(self):
+        for query, user, expected in (
+                ('is_favorited=1', 0, [0]),
+                ('is_favorited=1', 1, [2]),
+                ('is_in_shopping_cart=1', 0, [1]),
+                ('is_in_shopping_cart=1', 1, [])):
+            with self.subTest(query=query, user=user):
+                flags = self.get_flags(self.users[user], query)
+                self.assertEqual(list(flags),
+                                 [self.recipes[index].id
+                                  for index in expected])
+
+
+@override_settings(**TEST_SETTINGS)
+class RecipeOrderingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # The oldest recipe is the most favorited, the newest is not
+        cls.recipes = create_recipes(create_user('author'), 3)
+        for number, recipe in enumerate(cls.recipes[:2]):
+            for index in range(2 - number):
+                fan = create_user(f'fan{number}{index}')
+                Favorite.objects.create(user=fan, recipe=recipe)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_most_favorited_first(self):
+        response = self.client.get(f'{RECIPES_URL}?ordering=-favorites_count')
+        self.assertEqual([recipe['id'] for recipe in response.data['results']],
+                         [recipe.id for recipe in self.recipes])
+
+    def test_new_favorites_reorder(self):
+        fans = [create_user(f'new{index}') for index in range(3)]
+        url = f'{RECIPES_URL}?ordering=-favorites_count'
+        self.client.get(url)
+        # Favorites do not bump the cached feed pages
+        newest = self.recipes[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            for fan in fans:
+                Favorite.objects.create(user=fan, recipe=newest)
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['id'], newest.id)
+
+    def test_unknown_field(self):
+        response = self.client.get(f'{RECIPES_URL}?ordering=-text')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(**TEST_SETTINGS)
+class RecipeCursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        author = create_user('author')
+        cls.user.subscriptions.add(author)
+        recipes = create_recipes(author, 7)
+        # Published at the same moment, the cursor can not tell them apart
+        # by the date
+        Recipe.objects.update(pub_date=recipes[0].pub_date)
+        FeedEntry.objects.update(pub_date=recipes[0].pub_date)
+        cls.ids = [recipe.id for recipe in reversed(recipes)]
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url: str) -> list[int]:
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_recipes(self):
+        self.assertEqual(self.walk(f'{RECIPES_URL}?pagination=cursor&limit=2'),
+                         self.ids)
+
+    def test_delete_between_pages(self):
+        response = self.client.get(
+            f'{RECIPES_URL}?pagination=cursor&limit=2')
+        ids = [recipe['id'] for recipe in response.data['results']]
+        Recipe.objects.filter(id=ids[0]).delete()
+        self.assertEqual(ids + self.walk(response.data['next']), self.ids)
+
+    def test_feed(self):
+        self.assertEqual(
+            self.walk(f'{RECIPES_URL}feed/?pagination=cursor&limit=2'),
+            self.ids)
+
+    def test_own_order_refused(self):
+        for query in ('ordering=-favorites_count', 'search=Рецепт'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    f'{RECIPES_URL}?pagination=cursor&{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('pagination', response.data)
+                # Page numbers keep the order of the param
+                response = self.client.get(f'{RECIPES_URL}?{query}')
+                self.assertEqual(response.status_code, 200)
+
+
+@override_settings(**TEST_SETTINGS)
+class RecipeFilterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe, = create_recipes(create_user('author'), 1)
+        cls.ingredient_id = cls.recipe.ingredients.get().id
+
+    def setUp(self):
+        clear_caches()
+
+    def test_ingredients(self):
+        for query, count in ((f'ingredients_any={self.ingredient_id}', 1),
+                             (f'ingredients_all={self.ingredient_id},0', 0),
+                             (f'ingredients_exclude={self.ingredient_id}',
+                              0)):
+            with self.subTest(query=query):
+                response = self.client.get(f'{RECIPES_URL}?{query}')
+                self.assertEqual(response.data['count'], count)
+
+    def test_non_integer_ids(self):
+        for query in (f'author={self.recipe.author_id}.5',
+                      f'ingredients_any={self.ingredient_id}.5',
+                      f'ingredients_all={self.ingredient_id},2.5',
+                      'ingredients_exclude=1e3'):
+            with self.subTest(query=query):
+                response = self.client.get(f'{RECIPES_URL}?{query}')
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(**TEST_SETTINGS)
+class RecipeTagFilterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Breakfast: all three; lunch: the first two
+        cls.recipes = create_recipes(create_user('author'), 3)
+        cls.lunch = Tag.objects.create(name='Обед', slug='lunch',
+                                       color='#49B64E')
+        for recipe in cls.recipes[:2]:
+            recipe.tags.add(cls.lunch)
+
+    def setUp(self):
+        clear_caches()
+
+    def get_ids(self, query: str) -> list[int]:
+        response = self.client.get(f'{RECIPES_URL}?{query}')
+        self.assertEqual(response.status_code, 200)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(response.data['count'], len(ids))
+        return ids
+
+    def test_slugs(self):
+        newest_first = [recipe.id for recipe in reversed(self.recipes)]
+        for query, expected in (('tags=lunch', newest_first[1:]),
+                                ('tags=breakfast', newest_first),
+                                ('tags=breakfast&tags=lunch', newest_first)):
+            with self.subTest(query=query):
+                # Every recipe once, however many of the tags it has
+                self.assertEqual(self.get_ids(query), expected)
+
+    def test_unknown_slug(self):
+        response = self.client.get(f'{RECIPES_URL}?tags=dinner')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.data)
+
+    def test_new_tag(self):
+        self.get_ids('tags=lunch')
+        with self.captureOnCommitCallbacks(execute=True):
+            dinner = Tag.objects.create(name='Ужин', slug='dinner',
+                                        color='#8775D2')
+            self.recipes[0].tags.add(dinner)
+        self.assertEqual(self.get_ids('tags=dinner'), [self.recipes[0].id])
@@ -0,0 +1,80 @@
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.constants import PRIMARY_PIN_COOKIE
+from config.db_router import primary_reads, replica_reads
+from recipes.models import Recipe
+
+from .utils import TEST_CACHES, clear_caches, create_recipes, create_user
+
+REPLICA = 'replica_1'
+
+
+@override_settings(CACHES=TEST_CACHES, DATABASE_REPLICAS=[REPLICA])
+class ReplicaReadsTest(TestCase):
+    """
+    Routing of the reads to a replica, a second test database: it does
+    not get the rows written to the primary, which tells where a request
+    read.
+    """
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.recipe, = create_recipes(create_user('author'), 1)
+        cls.url = f'/api/recipes/{cls.recipe.id}/'
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def get_recipe(self, pin: str = None) -> tuple[int, int, int]:
+        """
+        Return the status of the response to an anonymous GET of the
+        recipe and the number of queries it ran on the primary and on the
+        replica.
+        """
+        if pin is not None:
+            self.client.cookies[PRIMARY_PIN_COOKIE] = pin
+        primary = CaptureQueriesContext(connections[DEFAULT_DB_ALIAS])
+        replica = CaptureQueriesContext(connections[REPLICA])
+        with primary, replica:
+            response = self.client.get(self.url)
+        return response.status_code, len(primary), len(replica)
+
+    def test_db_for_read(self):
+        self.assertEqual(router.db_for_read(Recipe), DEFAULT_DB_ALIAS)
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Recipe), REPLICA)
+            self.assertEqual(router.db_for_write(Recipe), DEFAULT_DB_ALIAS)
+            with primary_reads():
+                self.assertEqual(router.db_for_read(Recipe),
+                                 DEFAULT_DB_ALIAS)
+
+    def test_write_sets_pin(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(f'{self.url}favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertGreater(float(response.cookies[PRIMARY_PIN_COOKIE].value),
+                           time.time())
+
+    def test_read_from_replica(self):
+        for pin in (None, str(time.time() - 1)):
+            with self.subTest(pin=pin):
+                status, primary, replica = self.get_recipe(pin)
+                self.assertEqual(status, 404)
+                self.assertEqual(primary, 0)
+                self.assertGreater(replica, 0)
+
+    def test_pinned_read_from_primary(self):
+        for pin in (str(time.time() + 60), 'malformed'):
+            with self.subTest(pin=pin):
+                status, primary, replica = self.get_recipe(pin)
+                self.assertEqual(status, 200)
+                self.assertGreater(primary, 0)
+                self.assertEqual(replica, 0)
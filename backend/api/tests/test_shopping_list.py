@@ -0,0 +1,96 @@
+import json
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.constants import SHOPPING_LIST_PRINT_WIDTH
+from recipes.models import Ingredient, RecipeIngredient, ShoppingCart
+
+from .utils import TEST_SETTINGS, clear_caches, create_recipes, create_user
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+@override_settings(**TEST_SETTINGS)
+class ShoppingListExportTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('buyer')
+        recipes = create_recipes(create_user('author'), 2)
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        RecipeIngredient.objects.create(recipe=recipes[0], ingredient=salt,
+                                        amount=5)
+        # Eggs: 1 + 2
+        for recipe in recipes:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, file_format: str = None) -> tuple[str, str, str]:
+        """Return the content, its type and the file name."""
+        query = '' if file_format is None else f'?file_format={file_format}'
+        response = self.client.get(f'{DOWNLOAD_URL}{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        filename = response['Content-Disposition'].split('filename=')[1]
+        return content, response['Content-Type'], filename.strip('"')
+
+    def test_txt(self):
+        expected = 'Shopping list:\n1. Соль (г) — 5\n2. Яйцо (шт) — 3\n'
+        for file_format in (None, 'txt'):
+            with self.subTest(file_format=file_format):
+                self.assertEqual(self.download(file_format), (
+                    expected, 'text/plain; charset=utf-8',
+                    'shopping_list.txt'))
+
+    def test_csv(self):
+        self.assertEqual(self.download('csv'), (
+            'name,measurement_unit,amount\r\nСоль,г,5\r\nЯйцо,шт,3\r\n',
+            'text/csv; charset=utf-8', 'shopping_list.csv'))
+
+    def test_json(self):
+        content, content_type, filename = self.download('json')
+        self.assertEqual(json.loads(content), [
+            {'name': 'Соль', 'measurement_unit': 'г', 'amount': 5},
+            {'name': 'Яйцо', 'measurement_unit': 'шт', 'amount': 3},
+        ])
+        self.assertEqual((content_type, filename),
+                         ('application/json', 'shopping_list.json'))
+
+    def test_print(self):
+        content, content_type, filename = self.download('print')
+        lines = content.splitlines()
+        self.assertEqual(len(lines), 2)
+        # The amounts are aligned right with dots
+        for line, start, end in zip(lines,
+                                    ('[ ] Соль, г ..', '[ ] Яйцо, шт ..'),
+                                    ('. 5', '. 3')):
+            self.assertTrue(line.startswith(start))
+            self.assertTrue(line.endswith(end))
+            self.assertEqual(len(line),
+                             len('[ ] ') + SHOPPING_LIST_PRINT_WIDTH)
+        self.assertEqual((content_type, filename),
+                         ('text/plain; charset=utf-8', 'shopping_list.txt'))
+
+    def test_empty(self):
+        ShoppingCart.objects.filter(user=self.user).delete()
+        self.assertEqual(self.download('txt')[0], 'Shopping list:\n')
+        self.assertEqual(self.download('json')[0], '[]')
+
+    def test_unknown_format(self):
+        for method in ('get', 'post'):
+            with self.subTest(method=method):
+                response = getattr(self.client, method)(
+                    f'{DOWNLOAD_URL}?file_format=pdf')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('txt, csv, json, print',
+                              response.json()['errors'])
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(DOWNLOAD_URL).status_code, 401)
@@ -0,0 +1,187 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from authors.models import CustomUserSubscribe
+from recipes.models import FeedEntry
+
+from .utils import TEST_SETTINGS, clear_caches, create_recipes, create_user
+
+USERS_URL = '/api/users/'
+
+
+@override_settings(**TEST_SETTINGS)
+class SubscribeTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.author = create_user('author')
+        cls.recipes = create_recipes(cls.author, 4)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def subscribe(self, author_id):
+        return self.client.post(f'{USERS_URL}{author_id}/subscribe/'
+                                f'?recipes_limit=2')
+
+    def test_subscribe(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.subscribe(self.author.id)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['id'], self.author.id)
+        self.assertEqual(data['email'], self.author.email)
+        self.assertIs(data['is_subscribed'], True)
+        self.assertEqual(data['recipes_count'], len(self.recipes))
+        self.assertEqual([recipe['id'] for recipe in data['recipes']],
+                         [recipe.id for recipe in self.recipes[:-3:-1]])
+        # The subscription, its counter and the timeline, then the recipes
+        statements = [query['sql'] for query in queries
+                      if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(statements), 2)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.subscribers_count, 1)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(),
+                         len(self.recipes))
+
+    def test_subscribe_errors(self):
+        self.subscribe(self.author.id)
+        for author_id, status in ((self.author.id, 400),
+                                  (self.user.id, 400),
+                                  (self.author.id + 100, 404),
+                                  ('x', 404)):
+            with self.subTest(author_id=author_id):
+                self.assertEqual(self.subscribe(author_id).status_code,
+                                 status)
+
+    def test_bulk_subscribe(self):
+        self.subscribe(self.author.id)
+        other = create_user('other')
+        response = self.client.post(
+            f'{USERS_URL}subscribe/',
+            {'ids': [other.id, self.author.id, self.user.id, other.id + 100]},
+            format='json')
+        self.assertEqual([result['status']
+                          for result in response.data['results']],
+                         ['subscribed', 'already_subscribed', 'yourself',
+                          'not_found'])
+
+
+@override_settings(**TEST_SETTINGS)
+class SubscribedIdsTest(TestCase):
+    """is_subscribed of the user listings comes from one cached id set."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.authors = [create_user(f'author{number}')
+                       for number in range(4)]
+        cls.user.subscriptions.add(cls.authors[0], cls.authors[2])
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_flags(self) -> dict[int, bool]:
+        response = self.client.get(f'{USERS_URL}?limit=100')
+        self.assertEqual(response.status_code, 200)
+        return {user['id']: user['is_subscribed']
+                for user in response.data['results']}
+
+    def subscription_queries(self) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            flags = self.get_flags()
+        self.assertEqual(flags, {
+            self.user.id: False,
+            **{author.id: author.id in self.followed()
+               for author in self.authors}})
+        return len([query for query in queries
+                    if CustomUserSubscribe._meta.db_table in query['sql']])
+
+    def followed(self) -> set[int]:
+        return set(self.user.subscriptions.values_list('id', flat=True))
+
+    def test_one_query(self):
+        self.assertEqual(self.subscription_queries(), 1)
+        # Then read from the cache
+        self.assertEqual(self.subscription_queries(), 0)
+
+    def test_invalidated(self):
+        self.subscription_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{USERS_URL}{self.authors[1].id}/subscribe/')
+            self.client.delete(
+                f'{USERS_URL}{self.authors[0].id}/subscribe/')
+        self.assertEqual(self.followed(),
+                         {self.authors[1].id, self.authors[2].id})
+        self.assertEqual(self.subscription_queries(), 1)
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'{USERS_URL}?limit=100')
+        self.assertFalse(any(user['is_subscribed']
+                             for user in response.data['results']))
+        self.assertFalse([query for query in queries
+                          if CustomUserSubscribe._meta.db_table
+                          in query['sql']])
+
+
+@override_settings(**TEST_SETTINGS)
+class SubscriptionsListTest(TestCase):
+    """The recipes of the followed authors are fetched in one query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.authors = [create_user(f'author{number}')
+                       for number in range(3)]
+        cls.recipes = {author.id: create_recipes(author, number)
+                       for author, number in zip(cls.authors, (4, 1, 0))}
+        cls.user.subscriptions.add(*cls.authors)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_page(self, query: str) -> list[dict]:
+        response = self.client.get(f'{USERS_URL}subscriptions/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_recipes_limit(self):
+        for recipes_limit in (1, 2, 5):
+            with self.subTest(recipes_limit=recipes_limit):
+                authors = self.get_page(f'recipes_limit={recipes_limit}')
+                self.assertEqual(
+                    {author['id']: [recipe['id']
+                                    for recipe in author['recipes']]
+                     for author in authors},
+                    {author_id: [recipe.id for recipe
+                                 in recipes[::-1][:recipes_limit]]
+                     for author_id, recipes in self.recipes.items()})
+                self.assertEqual(
+                    [author['recipes_count'] for author in authors],
+                    [4, 1, 0])
+                self.assertTrue(all(author['is_subscribed']
+                                    for author in authors))
+
+    def test_constant_queries(self):
+        # The followed ids are cached by the first request
+        self.get_page('limit=1')
+        with CaptureQueriesContext(connection) as one_author:
+            self.assertEqual(len(self.get_page('limit=1&recipes_limit=3')),
+                             1)
+        with self.assertNumQueries(len(one_author)):
+            self.assertEqual(len(self.get_page('limit=3&recipes_limit=3')),
+                             3)
+        recipe_queries = [query['sql'] for query in one_author
+                          if 'ROW_NUMBER()' in query['sql']]
+        self.assertEqual(len(recipe_queries), 1)
@@ -0,0 +1,35 @@
+import tempfile
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from api.constants import SHOPPING_LIST_EXPORT_LIFETIME
+from api.tasks import delete_export, export_shopping_list
+from jobs.models import Job
+
+from .utils import create_user
+
+
+class ExportShoppingListTest(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    def test_export_expires(self):
+        result = export_shopping_list(create_user('buyer').id, 'txt')
+        job = Job.objects.get(name='api.delete_export')
+        name = job.payload['path']
+        self.assertEqual(urlsplit(result['url']).path,
+                         urlsplit(default_storage.url(name)).path)
+        self.assertEqual(datetime.fromisoformat(result['expires']),
+                         job.run_after)
+        lifetime = timedelta(seconds=SHOPPING_LIST_EXPORT_LIFETIME)
+        self.assertAlmostEqual(job.run_after - job.created, lifetime,
+                               delta=timedelta(seconds=5))
+        self.assertTrue(default_storage.exists(name))
+        delete_export(**job.payload)
+        self.assertFalse(default_storage.exists(name))
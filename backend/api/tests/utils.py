@@ -0,0 +1,72 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+# Per-process caches, emptied by clear_caches() before every test
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-default',
+    },
+    'feed': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-feed',
+    },
+}
+
+
+# Settings of the API tests
+TEST_SETTINGS = {'CACHES': TEST_CACHES}
+
+
+def clear_caches() -> None:
+    for alias in TEST_CACHES:
+        caches[alias].clear()
+
+
+def create_user(name: str) -> User:
+    return User.objects.create_user(email=f'{name}@example.com',
+                                    username=name,
+                                    first_name=name,
+                                    last_name=name,
+                                    password='password')
+
+
+def create_recipes(author: User, number: int) -> list[Recipe]:
+    """Recipes with one tag and one ingredient each."""
+    tag, _ = Tag.objects.get_or_create(name='Завтрак', slug='breakfast',
+                                       color='#E26C2D')
+    ingredient, _ = Ingredient.objects.get_or_create(name='Яйцо',
+                                                     measurement_unit='шт')
+    recipes = []
+    for index in range(number):
+        recipe = Recipe.objects.create(author=author,
+                                       name=f'Рецепт {index}',
+                                       text='Описание',
+                                       cooking_time=10,
+                                       image='recipes/images/test.png')
+        recipe.tags.add(tag)
+        RecipeIngredient.objects.create(recipe=recipe,
+                                        ingredient=ingredient,
+                                        amount=index + 1)
+        recipes.append(recipe)
+    return recipes
+
+
+def assert_consistent(test_case) -> None:
+    """
+    Check the denormalized data against their sources, as the maintenance
+    commands do: the shopping lists and the counters.
+    """
+    output = StringIO()
+    call_command('check_shopping_lists', stdout=output)
+    call_command('recount_counters', '--dry-run', stdout=output)
+    report = output.getvalue()
+    test_case.assertIn('The shopping lists are consistent', report)
+    test_case.assertNotRegex(report, r': [1-9]\d* rows drifted')
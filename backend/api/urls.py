@@ -1,12 +1,17 @@
+from django.conf import settings
 from django.urls import include, path
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.routers import DefaultRouter
 
-from .views import (CustomUserViewSet, IngredientViewSet,
+from .async_views import (AsyncCatalogueView, AsyncRecipeDetailView,
+                          AsyncRecipeListView, AsyncShoppingListView)
+from .views import (CustomUserViewSet, IngredientViewSet, JobViewSet,
                     RecipeViewSet, TagViewSet)
 
 
 router = DefaultRouter()
 router.register('ingredients', IngredientViewSet)
+router.register('jobs', JobViewSet, basename='jobs')
 router.register('recipes', RecipeViewSet)
 router.register('tags', TagViewSet)
 router.register('users', CustomUserViewSet)
@@ -15,3 +20,31 @@ urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+# Router views by URL name, they serve what the async views do not
+sync_views = {pattern.name: pattern.callback for pattern in router.urls}
+
+
+def async_route(route, view_class, name, **initkwargs):
+    view = view_class.as_view(sync_view=sync_views[name], **initkwargs)
+    return path(route, csrf_exempt(view))
+
+
+async_urlpatterns = [
+    async_route('ingredients/', AsyncCatalogueView, 'ingredient-list',
+                viewset_class=IngredientViewSet, action='list'),
+    async_route('ingredients/<int:pk>/', AsyncCatalogueView,
+                'ingredient-detail',
+                viewset_class=IngredientViewSet, action='retrieve'),
+    async_route('recipes/', AsyncRecipeListView, 'recipe-list'),
+    async_route('recipes/<int:pk>/', AsyncRecipeDetailView, 'recipe-detail'),
+    async_route('recipes/download_shopping_cart/', AsyncShoppingListView,
+                'recipe-download-shopping-cart'),
+    async_route('tags/', AsyncCatalogueView, 'tag-list',
+                viewset_class=TagViewSet, action='list'),
+    async_route('tags/<int:pk>/', AsyncCatalogueView, 'tag-detail',
+                viewset_class=TagViewSet, action='retrieve'),
+]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
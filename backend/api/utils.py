@@ -1,4 +1,12 @@
+from functools import cache
+
+from django.db import connection
+
 from recipes.models import Recipe, RecipeIngredient
+from recipes.shopping_list import ingredient_deltas
+
+from .cache import subscribed_ids
+from .constants import DEFAULT_RECIPES_PAGE_SIZE_ON_SUB
 
 
 def add_ingredients_to_recipe(recipe: Recipe,
@@ -21,3 +29,130 @@ def add_ingredients_to_recipe(recipe: Recipe,
                                          amount=ingredient['amount'])
                         for ingredient in ingredients]
     RecipeIngredient.objects.bulk_create(ingredients_list)
+
+
+def update_recipe_ingredients(recipe: Recipe,
+                              ingredients: list[dict]) -> dict[int, int]:
+    """
+    Bring the ingredients of a recipe in line with the provided list,
+    touching only the rows that actually change: changed amounts are
+    updated, new ingredients inserted and missing ones deleted.
+
+    Return the change of amount per ingredient id, as expected by
+    recipes.shopping_list.change_recipe(). Must run in a transaction: the
+    recipe row stays locked until it ends.
+
+    Parameters:
+    - recipe (Recipe): Recipe object being updated.
+    - ingredients (list of dict): The submitted ingredients, each with the
+    'id' and 'amount' keys.
+    """
+    # A concurrent edit of the recipe waits here until this one commits,
+    # then reads the amounts it wrote: two edits computing their deltas
+    # from the same old amounts would both apply them to the shopping lists
+    Recipe.objects.select_for_update().only('id').get(pk=recipe.pk)
+    existing = {row.ingredient_id: row
+                for row in RecipeIngredient.objects.filter(recipe=recipe)}
+    old_amounts = {ingredient_id: row.amount
+                   for ingredient_id, row in existing.items()}
+    new_amounts = {ingredient['id']: ingredient['amount']
+                   for ingredient in ingredients}
+
+    removed = old_amounts.keys() - new_amounts.keys()
+    if removed:
+        RecipeIngredient.objects.filter(recipe=recipe,
+                                        ingredient_id__in=removed).delete()
+    changed = []
+    for ingredient_id, row in existing.items():
+        amount = new_amounts.get(ingredient_id, row.amount)
+        if amount != row.amount:
+            row.amount = amount
+            changed.append(row)
+    if changed:
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
+    added = [ingredient for ingredient in ingredients
+             if ingredient['id'] not in existing]
+    if added:
+        add_ingredients_to_recipe(recipe, added)
+    return ingredient_deltas(old_amounts, new_amounts)
+
+
+def get_subscribed_ids(context: dict) -> set[int]:
+    """
+    Return the ids of the authors followed by the requesting user.
+
+    The ids come from the per-user cached set and are stored in the
+    serializer context, which is shared by nested and list serializers, so
+    every AuthorSerializer rendered within one response reuses them.
+
+    Parameters:
+    - context (dict): Serializer context holding the 'request'.
+    """
+    if 'subscribed_ids' not in context:
+        user = context['request'].user
+        context['subscribed_ids'] = subscribed_ids.get(user.id)
+    return context['subscribed_ids']
+
+
+def get_recipes_limit(request) -> int:
+    """
+    Return the number of recipes to show for every followed author,
+    taken from the 'recipes_limit' query parameter when it is valid.
+
+    Parameters:
+    - request (Request | None): The current request.
+    """
+    recipes_limit: int = DEFAULT_RECIPES_PAGE_SIZE_ON_SUB
+    if request:
+        param: str = request.query_params.get('recipes_limit')
+        if param and param.isdigit():
+            recipes_limit = int(param)
+    return recipes_limit
+
+
+def set_recipe_flags(recipes: list[dict],
+                     favorited: frozenset[int] = frozenset(),
+                     in_cart: frozenset[int] = frozenset(),
+                     followed: frozenset[int] = frozenset()) -> None:
+    """
+    Set the per-user fields of serialized recipes in place.
+
+    Parameters:
+    - recipes (list of dict): Recipes as RecipeGetSerializer renders them.
+    - favorited (frozenset of int): Ids of the favorite recipes.
+    - in_cart (frozenset of int): Ids of the recipes in the shopping cart.
+    - followed (frozenset of int): Ids of the followed authors.
+    """
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in favorited
+        recipe['is_in_shopping_cart'] = recipe['id'] in in_cart
+        recipe['author']['is_subscribed'] = (recipe['author']['id']
+                                             in followed)
+
+
+@cache
+def foreign_key_names(table_names: tuple[str]) -> list[str]:
+    """Names of the foreign key constraints of the tables."""
+    with connection.cursor() as cursor:
+        return [name for table_name in table_names
+                for name, constraint in connection.introspection
+                .get_constraints(cursor, table_name).items()
+                if constraint['foreign_key']]
+
+
+def check_foreign_keys(table_names: tuple[str]) -> None:
+    """
+    Check the deferred foreign keys of the tables now instead of at the
+    commit, raising IntegrityError for a row that references a missing
+    one. The other deferred constraints of the transaction are left to
+    the commit: on PostgreSQL connection.check_constraints() checks them
+    all, whatever its table_names.
+
+    Parameters:
+    - table_names (tuple of str): Tables whose foreign keys are checked.
+    """
+    names = ', '.join(connection.ops.quote_name(name)
+                      for name in foreign_key_names(table_names))
+    with connection.cursor() as cursor:
+        cursor.execute(f'SET CONSTRAINTS {names} IMMEDIATE')
+        cursor.execute(f'SET CONSTRAINTS {names} DEFERRED')
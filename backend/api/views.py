@@ -1,32 +1,52 @@
-import io
-
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse, JsonResponse
+from django.db import transaction
+from django.db.models import (Exists, F, OuterRef, Prefetch, Q, Value,
+                              Window)
+from django.db.models.functions import RowNumber
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import filters, status, permissions, viewsets
+from rest_framework import status, permissions, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from .autocomplete import ingredient_index
+from .cache import (cart_ids, favorite_ids, ingredients_catalogue,
+                    recipes_feed_cache, subscribed_ids, tags_catalogue)
+from .constants import (INGREDIENTS_AUTOCOMPLETE_LIMIT,
+                        INGREDIENTS_AUTOCOMPLETE_MAX_LIMIT,
+                        SHOPPING_LIST_DEFAULT_FORMAT, SHOPPING_LIST_FILENAME,
+                        SHOPPING_LIST_FORMAT_PARAM)
+from .exports import EXPORT_FORMATS, shopping_list_rows
 from .filters import RecipeFilterSet
-from .pagination import UsersPagination, RecipesPagination
+from .mixins import (CachedCatalogueMixin, CachedFeedMixin,
+                     SelectablePaginationMixin)
+from .pagination import (RecipesCursorPagination, RecipesPagination,
+                         UsersCursorPagination, UsersPagination)
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (AuthorSerializer, AuthorWithRecipesSerializer,
-                          IngredientSerializer, RecipeSerializer,
-                          RecipeMinifiedSerializer, TagSerializer)
-from authors.models import CustomUserSubscribe
-from recipes.models import (Favorite, Ingredient, Recipe,
+                          IdListSerializer, IngredientSerializer,
+                          JobSerializer, RecipeGetSerializer,
+                          RecipeSerializer, RecipeMinifiedSerializer,
+                          TagSerializer)
+from .utils import get_recipes_limit, set_recipe_flags
+from authors import subscriptions as bulk_subscriptions
+from jobs.models import Job
+from jobs.runner import enqueue
+from recipes import bulk, feed
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
                             RecipeIngredient, ShoppingCart, Tag)
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(SelectablePaginationMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = AuthorSerializer
     pagination_class = UsersPagination
+    cursor_pagination_class = UsersCursorPagination
+    cursor_pagination_actions = ('subscriptions',)
 
     def get_permissions(self):
         if self.action == 'me':
@@ -35,38 +55,88 @@ class CustomUserViewSet(UserViewSet):
 
     @action(detail=True, methods=['POST', 'DELETE'])
     def subscribe(self, request, id=None):
-        author = get_object_or_404(User, pk=id)
+        if not str(id).isdigit():
+            raise Http404
         user = request.user
-        subscription = CustomUserSubscribe.objects.filter(user=user,
-                                                          author=author)
+        author_id = int(id)
 
         # Default response parameters
         data = {}
         response_status = status.HTTP_400_BAD_REQUEST
 
         if request.method == 'POST':
-            if user == author:
+            with transaction.atomic():
+                added = bulk_subscriptions.subscribe(user.id, [author_id])
+                subscribed_ids.invalidate(user.id)
+            if added:
+                # Followed from now on, whatever the cached set says
+                context = {'request': request, 'subscribed_ids': {author_id}}
+                data = AuthorWithRecipesSerializer(added[0],
+                                                   context=context).data
+                response_status = status.HTTP_201_CREATED
+            # Nothing is inserted for a missing author or for the user
+            elif user == get_object_or_404(User, pk=author_id):
                 data = {'errors': 'Can not subscribe to yourself!'}
-            elif subscription.exists():
-                data = {'errors': 'Already subscribed to this user!'}
             else:
-                CustomUserSubscribe.objects.create(user=user, author=author)
-                data = AuthorWithRecipesSerializer(
-                    author, context={'request': request}).data
-                response_status = status.HTTP_201_CREATED
+                data = {'errors': 'Already subscribed to this user!'}
             return JsonResponse(data=data, status=response_status)
 
-        if not subscription.exists():
+        with transaction.atomic():
+            removed = bulk_subscriptions.unsubscribe(user.id, [author_id])
+            subscribed_ids.invalidate(user.id)
+        if not removed:
+            get_object_or_404(User, pk=author_id)
             data = {'errors': 'You are not subscribed to this user!'}
         else:
-            subscription.delete()
             response_status = status.HTTP_204_NO_CONTENT
         return JsonResponse(data=data, status=response_status)
 
+    @action(detail=False, methods=['POST', 'DELETE'], url_path='subscribe',
+            permission_classes=[permissions.IsAuthenticated])
+    def bulk_subscribe(self, request):
+        serializer = IdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        with transaction.atomic():
+            if request.method == 'POST':
+                changed = [author.id for author
+                           in bulk_subscriptions.subscribe(user.id, ids)]
+                done, skipped = 'subscribed', 'already_subscribed'
+            else:
+                changed = bulk_subscriptions.unsubscribe(user.id, ids)
+                done, skipped = 'unsubscribed', 'not_subscribed'
+            subscribed_ids.invalidate(user.id)
+        existing = set(User.objects.filter(id__in=set(ids) - set(changed))
+                       .values_list('id', flat=True))
+        results = []
+        for author_id in ids:
+            if author_id in changed:
+                result = done
+            elif author_id == user.id:
+                result = 'yourself'
+            elif author_id in existing:
+                result = skipped
+            else:
+                result = 'not_found'
+            results.append({'id': author_id, 'status': result})
+        return Response({'results': results})
+
     @action(detail=False, methods=['GET'])
     def subscriptions(self, request):
         user = request.user
-        subscriptions = user.subscriptions.all()
+        # The first recipes of every author on the page in one query:
+        # ROW_NUMBER() OVER (PARTITION BY author_id ORDER BY pub_date DESC)
+        limited_recipes = Recipe.objects.annotate(
+            row_number=Window(RowNumber(),
+                              partition_by=F('author_id'),
+                              order_by=F('pub_date').desc())
+        ).filter(row_number__lte=get_recipes_limit(request))
+        subscriptions = user.subscriptions.prefetch_related(
+            Prefetch('recipes',
+                     queryset=limited_recipes,
+                     to_attr='limited_recipes')
+        )
         queryset = self.filter_queryset(subscriptions)
         page = self.paginate_queryset(queryset) or queryset
         serializer = AuthorWithRecipesSerializer(
@@ -74,61 +144,182 @@ class CustomUserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedCatalogueMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = [filters.SearchFilter, ]
-    search_fields = ['^name', ]
+    catalogue = ingredients_catalogue
 
+    def filter_catalogue(self, entry):
+        # Case-insensitive search by the beginning of the name
+        prefix: str = self.request.query_params.get('name')
+        if not prefix:
+            return entry.data
+        return ingredient_index.search(prefix, catalogue=entry)
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=False, methods=['GET'])
+    def autocomplete(self, request):
+        """Type-ahead lookup by name prefix with a bounded result size."""
+        prefix: str = request.query_params.get('name', '')
+        limit: int = INGREDIENTS_AUTOCOMPLETE_LIMIT
+        param: str = request.query_params.get('limit')
+        if param and param.isdigit():
+            limit = min(int(param), INGREDIENTS_AUTOCOMPLETE_MAX_LIMIT)
+        if not prefix:
+            return Response([])
+        return Response(ingredient_index.search(prefix, limit))
+
+
+class TagViewSet(CachedCatalogueMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    catalogue = tags_catalogue
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = (Recipe.objects.all().select_related('author')
-                .prefetch_related('tags', 'ingredients'))
+class RecipeViewSet(CachedFeedMixin, SelectablePaginationMixin,
+                    viewsets.ModelViewSet):
+    queryset = (Recipe.objects.defer('search_vector').select_related('author')
+                .prefetch_related(
+                    'tags',
+                    Prefetch('recipe_ingredients',
+                             queryset=(RecipeIngredient.objects
+                                       .select_related('ingredient')))
+                ))
     serializer_class = RecipeSerializer
     pagination_class = RecipesPagination
+    cursor_pagination_class = RecipesCursorPagination
+    cursor_pagination_actions = ('list', 'feed')
+    # Both order the recipes by something else than the cursor
+    cursor_pagination_conflicts = ('ordering', 'search')
+    feed_cache = recipes_feed_cache
     filter_backends = [DjangoFilterBackend, ]
     filterset_class = RecipeFilterSet
     permission_classes = [IsAuthorOrReadOnly, ]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        # Resolve the per-user flags in the same query as the recipes
+        # instead of running two EXISTS queries per serialized recipe
+        if user.is_anonymous:
+            return queryset.annotate(is_favorited=Value(False),
+                                     is_in_shopping_cart=Value(False))
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+        )
+
+    def overlay_feed(self, data, user):
+        if user is None:
+            set_recipe_flags(data['results'])
+        else:
+            set_recipe_flags(data['results'], favorite_ids.get(user.id),
+                             cart_ids.get(user.id),
+                             subscribed_ids.get(user.id))
+        return data
+
     def partial_update(self, request, *args, **kwargs):
         return self.update(request, *args, **kwargs)
 
     @staticmethod
-    def add(request, model, id):
-        recipe = get_object_or_404(Recipe, pk=id)
-        if model.objects.filter(user=request.user, recipe=recipe).exists():
+    def add(request, model, id, id_set):
+        if not str(id).isdigit():
+            raise Http404
+        with transaction.atomic():
+            added = bulk.add_recipes(model, request.user.id, [int(id)])
+            id_set.invalidate(request.user.id)
+        if not added:
+            # Nothing is inserted for a missing recipe
+            get_object_or_404(Recipe, pk=id)
             data = {'errors': 'The recipe is already added!'}
             return JsonResponse(data=data, status=status.HTTP_400_BAD_REQUEST)
-        model.objects.create(user=request.user, recipe=recipe)
-        data = RecipeMinifiedSerializer(recipe).data
+        data = RecipeMinifiedSerializer(added[0]).data
         return JsonResponse(data=data, status=status.HTTP_201_CREATED)
 
     @staticmethod
-    def remove(request, model, id):
-        recipe = get_object_or_404(Recipe, pk=id)
-        entry = model.objects.filter(user=request.user, recipe=recipe)
-        if not entry.exists():
+    def remove(request, model, id, id_set):
+        if not str(id).isdigit():
+            raise Http404
+        with transaction.atomic():
+            removed = bulk.remove_recipes(model, request.user.id, [int(id)])
+            id_set.invalidate(request.user.id)
+        if not removed:
+            get_object_or_404(Recipe, pk=id)
             data = {'errors': 'The recipe is not in the list!'}
             return JsonResponse(data=data, status=status.HTTP_400_BAD_REQUEST)
-        entry.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @staticmethod
+    def bulk_change(request, model, id_set):
+        serializer = IdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        with transaction.atomic():
+            if request.method == 'POST':
+                changed = [recipe.id for recipe
+                           in bulk.add_recipes(model, user.id, ids)]
+                done, skipped = 'added', 'already_added'
+            else:
+                changed = bulk.remove_recipes(model, user.id, ids)
+                done, skipped = 'removed', 'not_in_list'
+            id_set.invalidate(user.id)
+        existing = set(Recipe.objects.filter(id__in=set(ids) - set(changed))
+                       .values_list('id', flat=True))
+        results = [{'id': recipe_id,
+                    'status': (done if recipe_id in changed
+                               else skipped if recipe_id in existing
+                               else 'not_found')}
+                   for recipe_id in ids]
+        return Response({'results': results})
+
+    @action(detail=False, methods=['POST', 'DELETE'], url_path='favorite',
+            permission_classes=[permissions.IsAuthenticated])
+    def bulk_favorite(self, request):
+        return self.bulk_change(request, Favorite, favorite_ids)
+
+    @action(detail=False, methods=['POST', 'DELETE'],
+            url_path='shopping_cart',
+            permission_classes=[permissions.IsAuthenticated])
+    def bulk_shopping_cart(self, request):
+        return self.bulk_change(request, ShoppingCart, cart_ids)
+
     @action(detail=True, methods=['POST', 'DELETE'], url_path='favorite')
     def add_to_favorites(self, request, pk=None):
         if request.method == 'POST':
-            return self.add(request, Favorite, pk)
-        return self.remove(request, Favorite, pk)
+            return self.add(request, Favorite, pk, favorite_ids)
+        return self.remove(request, Favorite, pk, favorite_ids)
 
     @action(detail=True, methods=['POST', 'DELETE'], url_path='shopping_cart')
     def add_to_shopping_cart(self, request, pk=None):
         if request.method == 'POST':
-            return self.add(request, ShoppingCart, pk)
-        return self.remove(request, ShoppingCart, pk)
+            return self.add(request, ShoppingCart, pk, cart_ids)
+        return self.remove(request, ShoppingCart, pk, cart_ids)
+
+    @action(detail=False, methods=['GET'],
+            permission_classes=[permissions.IsAuthenticated])
+    def feed(self, request):
+        user = request.user
+        large_authors = feed.large_followed_authors(user.id)
+        if large_authors:
+            # Merge in the recipes of the authors who are not fanned out
+            queryset = self.get_queryset().filter(
+                Q(Exists(FeedEntry.objects.filter(user=user,
+                                                  recipe=OuterRef('pk'))))
+                | Q(author_id__in=large_authors))
+            page = self.paginate_queryset(queryset)
+        else:
+            # A range scan of the timeline, then the recipes of the page
+            entries = self.paginate_queryset(
+                FeedEntry.objects.filter(user=user))
+            recipes = self.get_queryset().in_bulk(
+                [entry.recipe_id for entry in entries])
+            page = [recipes[entry.recipe_id] for entry in entries
+                    if entry.recipe_id in recipes]
+        serializer = RecipeGetSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['GET'], url_path='cart')
     def shopping_cart(self, request):
@@ -139,29 +330,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
                                               context={'request': request})
         return self.get_paginated_response(serializer.data)
 
-    @action(detail=False, methods=['GET'])
+    @action(detail=False, methods=['GET', 'POST'],
+            permission_classes=[permissions.IsAuthenticated])
     def download_shopping_cart(self, request):
-        user = request.user
-        recipes_in_cart = self.get_queryset().filter(shopping_cart__user=user)
-        ingredient_entries = RecipeIngredient.objects.filter(
-            recipe__in=recipes_in_cart
-        ).select_related('ingredient')
-
-        summarized_ingredients: list[dict[str, str, int]]
-        summarized_ingredients = list(ingredient_entries
-                                      .values('ingredient__name',
-                                              'ingredient__measurement_unit')
-                                      .annotate(Sum('amount'))
-                                      .order_by('ingredient__name'))
-
-        file = io.StringIO()
-        file.write('Shopping list:\n')
-        for i, ingredient in enumerate(summarized_ingredients):
-            name: str = ingredient.get('ingredient__name')
-            units: str = ingredient.get('ingredient__measurement_unit')
-            amount: int = ingredient.get('amount__sum')
-            new_line = f'{i + 1}. {name} ({units}) — {amount}\n'
-            file.write(new_line)
-
-        response = HttpResponse(file.getvalue(), content_type='text/plain')
+        file_format: str = request.query_params.get(
+            SHOPPING_LIST_FORMAT_PARAM, SHOPPING_LIST_DEFAULT_FORMAT)
+        export_format = EXPORT_FORMATS.get(file_format)
+        if export_format is None:
+            data = {'errors': f'Unknown format! Available: '
+                              f'{", ".join(EXPORT_FORMATS)}'}
+            return JsonResponse(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            # Render the file in the background, the job result has its URL
+            job = enqueue('api.export_shopping_list', user=request.user,
+                          user_id=request.user.id, file_format=file_format)
+            return Response(JobSerializer(job).data,
+                            status=status.HTTP_202_ACCEPTED)
+
+        response = StreamingHttpResponse(
+            export_format.render(shopping_list_rows(request.user.id)),
+            content_type=export_format.content_type)
+        filename = f'{SHOPPING_LIST_FILENAME}.{export_format.extension}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status of the background jobs started by the current user."""
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated, ]
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
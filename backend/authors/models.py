@@ -14,6 +14,12 @@ class CustomUser(AbstractUser):
     subscriptions = models.ManyToManyField(to='self',
                                            through='CustomUserSubscribe',
                                            verbose_name='Подписки')
+    # Denormalized counters, maintained by authors.signals
+    # and recipes.signals
+    recipes_count = models.PositiveIntegerField('Кол-во рецептов',
+                                                default=0)
+    subscribers_count = models.PositiveIntegerField('Кол-во подписчиков',
+                                                    default=0)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'username']
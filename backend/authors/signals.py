@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes import feed
+from recipes.signals import change_counter
+
+from .models import CustomUser, CustomUserSubscribe
+
+
+@receiver(post_save, sender=CustomUserSubscribe)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(CustomUser, instance.author_id, 'subscribers_count', 1)
+        feed.follow(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=CustomUserSubscribe)
+def subscription_deleted(sender, instance, **kwargs):
+    change_counter(CustomUser, instance.author_id, 'subscribers_count', -1)
+    feed.unfollow(instance.user_id, [instance.author_id])
@@ -0,0 +1,77 @@
+"""
+Changes of the subscriptions of a user.
+
+Like recipes.bulk, the rows and the subscriber counters of the authors
+that actually changed are written by one statement with data-modifying
+common table expressions, which also backfills the feed timeline of the
+follower; unfollowed authors are pruned from it next, once for the whole
+batch. No model signals are sent.
+"""
+from django.db import connection
+
+from recipes import feed
+
+from .models import CustomUser, CustomUserSubscribe
+
+SUBSCRIPTIONS = CustomUserSubscribe._meta.db_table
+USERS = CustomUser._meta.db_table
+
+# Returned for the newly followed authors, as AuthorWithRecipesSerializer
+# shows them
+AUTHOR_FIELDS = ['id', 'username', 'email', 'first_name', 'last_name',
+                 'recipes_count']
+
+
+def subscribe(user_id: int, author_ids: list[int]) -> list[CustomUser]:
+    """
+    Subscribe the user to the existing authors among author_ids, except
+    the user themself.
+
+    Return the authors that were not followed before, with the fields of
+    AUTHOR_FIELDS loaded.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH added AS ('
+            f'INSERT INTO {SUBSCRIPTIONS} (user_id, author_id, created) '
+            f'SELECT %(user_id)s, id, now() FROM {USERS} '
+            f'WHERE id = ANY(%(author_ids)s::bigint[]) '
+            f'AND id <> %(user_id)s '
+            f'ON CONFLICT (user_id, author_id) DO NOTHING '
+            f'RETURNING author_id), '
+            f'counted AS ('
+            f'UPDATE {USERS} SET subscribers_count = subscribers_count + 1 '
+            f'FROM added WHERE {USERS}.id = added.author_id '
+            f'RETURNING {", ".join(f"{USERS}.{f}" for f in AUTHOR_FIELDS)}, '
+            f'{USERS}.subscribers_count), '
+            f'{feed.follow_cte("counted")} '
+            f'SELECT {", ".join(AUTHOR_FIELDS)} FROM counted',
+            {'user_id': user_id, 'author_ids': author_ids}
+        )
+        return [CustomUser(**dict(zip(AUTHOR_FIELDS, row)))
+                for row in cursor.fetchall()]
+
+
+def unsubscribe(user_id: int, author_ids: list[int]) -> list[int]:
+    """
+    Unsubscribe the user from the authors.
+
+    Return the ids of the authors that were followed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH removed AS ('
+            f'DELETE FROM {SUBSCRIPTIONS} '
+            f'WHERE user_id = %(user_id)s '
+            f'AND author_id = ANY(%(author_ids)s::bigint[]) '
+            f'RETURNING author_id) '
+            f'UPDATE {USERS} '
+            f'SET subscribers_count = GREATEST(subscribers_count - 1, 0) '
+            f'FROM removed WHERE {USERS}.id = removed.author_id '
+            f'RETURNING {USERS}.id',
+            {'user_id': user_id, 'author_ids': author_ids}
+        )
+        removed = [author_id for author_id, in cursor.fetchall()]
+    if removed:
+        feed.unfollow(user_id, removed)
+    return removed
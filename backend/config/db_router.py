@@ -0,0 +1,57 @@
+"""
+Routing of the reads to the PostgreSQL replicas.
+
+Reads go to a random replica of DATABASE_REPLICAS only inside
+replica_reads(), which api.middleware enters for the safe API requests of
+the clients that have not written anything lately. Everything else --
+writes, management commands, the job workers, the admin -- uses the
+primary.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_replica_reads: ContextVar[bool] = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(enabled: bool = True):
+    """
+    Send the reads of the block to the replicas, or back to the primary
+    when enabled is False.
+    """
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def primary_reads():
+    """
+    Read from the primary in the block, for the results that outlive the
+    request, such as the shared caches, and must not lag behind it.
+    """
+    return replica_reads(False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and _replica_reads.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replicas get the schema through replication, the test replica
+        # is not one of them
+        return db not in settings.DATABASE_REPLICAS
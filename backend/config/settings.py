@@ -1,5 +1,6 @@
 # flake8: noqa
 import os
+import sys
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -24,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Frameworks
     'rest_framework',
@@ -34,6 +36,7 @@ INSTALLED_APPS = [
     # Local apps
     'authors',
     'recipes',
+    'jobs',
     'api',
 ]
 
@@ -41,6 +44,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'api.middleware.replica_reads_middleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -67,6 +71,17 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+
+def conn_max_age(alias: str) -> int:
+    """
+    Seconds a worker keeps its connection to a database open, 0 to close
+    it after every request: DB_CONN_MAX_AGE_<ALIAS>, else DB_CONN_MAX_AGE.
+    Keep it 0 on ASGI, where every request has a thread of its own.
+    """
+    return int(os.getenv(f'DB_CONN_MAX_AGE_{alias.upper()}',
+                         os.getenv('DB_CONN_MAX_AGE', 0)))
+
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -74,10 +89,79 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': conn_max_age('default'),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# `manage.py test` leaves the replicas out: the router tests read from a
+# replica_1 of their own, a second test database where the rows written
+# to the primary never show up, and list it in DATABASE_REPLICAS themselves
+TESTING = sys.argv[1:2] == ['test']
+
+# Streaming replicas of the primary for the API reads, as space-separated
+# host[:port] in DB_REPLICA_HOSTS; they are the aliases replica_1, ...
+DATABASE_REPLICAS = []
+REPLICA_HOSTS = [] if TESTING else os.getenv('DB_REPLICA_HOSTS', '').split()
+for number, address in enumerate(REPLICA_HOSTS, start=1):
+    host, _, port = address.partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'CONN_MAX_AGE': conn_max_age(alias),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+if TESTING:
+    DATABASES['replica_1'] = {
+        **DATABASES['default'],
+        'TEST': {'NAME': f'test_{DATABASES["default"]["NAME"]}_replica_1'},
+    }
+
+DATABASE_ROUTERS = ['config.db_router.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after a write, longer
+# than the replication lag
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
+
+# Cache shared by all the workers of the service: 'file' or 'locmem'
+CACHE_BACKENDS = {
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+CACHE_BACKEND = os.getenv('DJANGO_CACHE_BACKEND', 'file')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', '/tmp/foodgram_cache'),
+    },
+    # Shared pages of the recipe feed: with a per-worker backend every
+    # worker builds and keeps its own copy of a page
+    'feed': {
+        'BACKEND': CACHE_BACKENDS[os.getenv('FEED_CACHE_BACKEND',
+                                            CACHE_BACKEND)],
+        'LOCATION': os.getenv('FEED_CACHE_LOCATION',
+                              '/tmp/foodgram_feed_cache'),
+    },
+}
+
+# Route the hot read endpoints to the async views of api.async_views,
+# for a deployment on an ASGI server
+ASYNC_READ_VIEWS = os.getenv('DJANGO_ASYNC_READ_VIEWS', False) == 'True'
+# Database connections an async worker process may open at once
+ASYNC_READ_VIEWS_CONNECTIONS = int(
+    os.getenv('DJANGO_ASYNC_READ_VIEWS_CONNECTIONS', 20))
+
+# Run background jobs in-process right after the commit instead of
+# leaving them to `manage.py run_workers`
+JOBS_EAGER = os.getenv('JOBS_EAGER', False) == 'True'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
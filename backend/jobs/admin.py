@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'user',
+                    'run_after', 'updated',)
+    list_display_links = ('name',)
+    list_filter = ('status', 'name',)
+    ordering = ('-id',)
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,22 @@
+"""
+Constants for app 'jobs'
+"""
+
+# models.py
+JOB_NAME_MAX_LENGTH: int = 100
+JOB_STATUS_MAX_LENGTH: int = 10
+JOB_MAX_ATTEMPTS: int = 3
+
+# runner.py
+# Seconds before a failed job is retried, doubled on every attempt
+JOB_RETRY_DELAY: int = 10
+# Seconds between two touches of a running job by its worker
+JOB_HEARTBEAT_INTERVAL: int = 30
+# Seconds after which a running job is considered abandoned by its worker,
+# a few missed heartbeats
+JOB_STALE_AFTER: int = 4 * JOB_HEARTBEAT_INTERVAL
+JOB_ABANDONED_ERROR: str = 'The worker running the job stopped responding'
+
+# run_workers.py
+WORKERS_DEFAULT_COUNT: int = 2
+WORKERS_POLL_INTERVAL: float = 1.0
@@ -0,0 +1,79 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs.constants import WORKERS_DEFAULT_COUNT, WORKERS_POLL_INTERVAL
+from jobs.runner import claim_jobs, run_job
+
+
+def work(stop, poll_interval: float, burst: bool) -> None:
+    """Claim and run jobs one by one until stop is set."""
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            jobs = claim_jobs()
+            if not jobs:
+                if burst:
+                    return
+                stop.wait(poll_interval)
+            for job in jobs:
+                run_job(job)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers against the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers',
+                            type=int,
+                            default=WORKERS_DEFAULT_COUNT,
+                            help='Number of workers')
+        parser.add_argument('--mode',
+                            choices=['thread', 'process'],
+                            default='thread',
+                            help='Run the workers as threads or processes')
+        parser.add_argument('--poll-interval',
+                            type=float,
+                            default=WORKERS_POLL_INTERVAL,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--burst',
+                            action='store_true',
+                            help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        count = options.get('workers')
+        mode = options.get('mode')
+        if mode == 'process':
+            # Children must not share the parent's database connections
+            connections.close_all()
+            # Forked children inherit the configured Django setup
+            context = multiprocessing.get_context('fork')
+            stop = context.Event()
+            worker_class = context.Process
+        else:
+            stop = threading.Event()
+            worker_class = threading.Thread
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        workers = [
+            worker_class(target=work,
+                         args=(stop, options.get('poll_interval'),
+                               options.get('burst')))
+            for _ in range(count)
+        ]
+        self.stdout.write(f'Starting {count} {mode} workers')
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS('Workers have stopped'))
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.utils import timezone
+
+from .constants import (JOB_MAX_ATTEMPTS, JOB_NAME_MAX_LENGTH,
+                        JOB_STATUS_MAX_LENGTH)
+
+User = get_user_model()
+
+
+class Job(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнено'
+        FAILED = 'failed', 'Ошибка'
+
+    name = models.CharField('Задача',
+                            max_length=JOB_NAME_MAX_LENGTH)
+    payload = models.JSONField('Параметры',
+                               default=dict)
+    status = models.CharField('Статус',
+                              max_length=JOB_STATUS_MAX_LENGTH,
+                              choices=Status.choices,
+                              default=Status.QUEUED)
+    result = models.JSONField('Результат',
+                              null=True,
+                              blank=True)
+    error = models.TextField('Ошибка',
+                             blank=True)
+    attempts = models.PositiveSmallIntegerField('Попытки',
+                                                default=0)
+    max_attempts = models.PositiveSmallIntegerField('Максимум попыток',
+                                                    default=JOB_MAX_ATTEMPTS)
+    run_after = models.DateTimeField('Запустить после',
+                                     default=timezone.now)
+    user = models.ForeignKey(to=User,
+                             on_delete=models.CASCADE,
+                             related_name='jobs',
+                             null=True,
+                             blank=True,
+                             verbose_name='Пользователь')
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    updated = models.DateTimeField('Обновлена', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['-created']
+        indexes = [
+            # Queue scan of the workers
+            models.Index(fields=['status', 'run_after'],
+                         name='job_status_run_after'),
+        ]
+
+    def __str__(self):
+        # Задача recipes.build_image_variants (ID:5): В очереди
+        return (f'Задача {self.name} (ID:{self.id}): '
+                f'{self.get_status_display()}')
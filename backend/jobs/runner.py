@@ -0,0 +1,177 @@
+"""
+Database-backed job queue.
+
+Jobs are rows of the Job table. Workers claim them with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of threads or processes
+can poll the same table without handing one job out twice and without an
+external broker.
+
+While a job runs, its worker touches the row every JOB_HEARTBEAT_INTERVAL
+seconds. A running job left untouched for JOB_STALE_AFTER seconds has lost
+its worker, which was killed or crashed: it is claimed again, or failed
+once it has used up its attempts.
+"""
+import logging
+import threading
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .constants import (JOB_ABANDONED_ERROR, JOB_HEARTBEAT_INTERVAL,
+                        JOB_RETRY_DELAY, JOB_STALE_AFTER)
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers: dict[str, Callable] = {}
+
+
+def task(name: str):
+    """
+    Register the decorated function as the handler of the jobs called
+    name. The payload of a job is passed as keyword arguments, and the
+    return value, which must be JSON serializable, is stored as its result.
+    """
+    def decorator(handler: Callable) -> Callable:
+        _handlers[name] = handler
+        return handler
+    return decorator
+
+
+def enqueue(name: str, user=None, run_after: datetime | None = None,
+            **payload) -> Job:
+    """
+    Queue a job. The row is written in the current transaction, so workers
+    only see it once the surrounding write commits. With JOBS_EAGER the
+    job is claimed and run in-process right after the commit instead,
+    unless it is scheduled for later; its retries are left to the workers.
+
+    Parameters:
+    - name (str): Name the handler was registered under.
+    - user (User | None): Owner allowed to read the job status.
+    - run_after (datetime | None): Time before which the job must not run.
+    - payload: Keyword arguments of the handler.
+    """
+    job = Job.objects.create(name=name, payload=payload, user=user,
+                             run_after=run_after or timezone.now())
+    if settings.JOBS_EAGER and run_after is None:
+        transaction.on_commit(lambda: run_eagerly(job.id))
+    return job
+
+
+def fail_abandoned_jobs(stale_before: datetime) -> int:
+    """Fail the abandoned jobs that have used up their attempts."""
+    return (Job.objects
+            .filter(status=Job.Status.RUNNING,
+                    updated__lt=stale_before,
+                    attempts__gte=F('max_attempts'))
+            .update(status=Job.Status.FAILED,
+                    error=JOB_ABANDONED_ERROR,
+                    updated=timezone.now()))
+
+
+def claim_jobs(limit: int = 1) -> list[Job]:
+    """Lock the next due jobs, skipping the ones other workers hold."""
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=JOB_STALE_AFTER)
+    fail_abandoned_jobs(stale_before)
+    with transaction.atomic():
+        jobs = list(
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(status=Job.Status.QUEUED, run_after__lte=now)
+                    | Q(status=Job.Status.RUNNING,
+                        updated__lt=stale_before,
+                        attempts__lt=F('max_attempts')))
+            .order_by('run_after', 'id')[:limit]
+        )
+        for job in jobs:
+            start_job(job)
+    return jobs
+
+
+def claim_job(job_id: int) -> Job | None:
+    """Lock a queued job unless a worker has claimed it already."""
+    with transaction.atomic():
+        job = (Job.objects
+               .select_for_update(skip_locked=True)
+               .filter(pk=job_id, status=Job.Status.QUEUED)
+               .first())
+        if job is not None:
+            start_job(job)
+    return job
+
+
+def start_job(job: Job) -> None:
+    """Mark a locked job as running for one more attempt."""
+    job.status = Job.Status.RUNNING
+    job.attempts += 1
+    job.save(update_fields=['status', 'attempts', 'updated'])
+
+
+class Heartbeat(threading.Thread):
+    """
+    Thread touching the row of a running job until stop() is called, so
+    that other workers do not take the job for abandoned however long it
+    runs.
+    """
+
+    def __init__(self, job: Job):
+        super().__init__(name=f'job-{job.id}-heartbeat', daemon=True)
+        self.job_id = job.id
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(JOB_HEARTBEAT_INTERVAL):
+                Job.objects.filter(pk=self.job_id,
+                                   status=Job.Status.RUNNING).update(
+                    updated=timezone.now())
+        finally:
+            # The connection of this thread
+            connections.close_all()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_eagerly(job_id: int) -> None:
+    """
+    Claim and run a job in-process, as a worker would: the heartbeat and
+    the retries then see it running, and a worker does not run it again.
+    """
+    job = claim_job(job_id)
+    if job is not None:
+        run_job(job)
+
+
+def run_job(job: Job) -> None:
+    """Run a claimed job and record its result or schedule a retry."""
+    handler = _handlers.get(job.name)
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for {job.name}')
+        job.result = handler(**job.payload)
+        job.status = Job.Status.DONE
+        job.error = ''
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.id, job.name)
+        job.error = traceback.format_exc()
+        if handler is not None and job.attempts < job.max_attempts:
+            job.status = Job.Status.QUEUED
+            delay = JOB_RETRY_DELAY * 2 ** max(job.attempts - 1, 0)
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        else:
+            job.status = Job.Status.FAILED
+    finally:
+        heartbeat.stop()
+    job.save(update_fields=['status', 'result', 'error', 'run_after',
+                            'updated'])
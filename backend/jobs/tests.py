@@ -0,0 +1,111 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .constants import JOB_ABANDONED_ERROR, JOB_STALE_AFTER
+from .models import Job
+from .runner import claim_jobs, enqueue, run_job, task
+
+STALE = timedelta(seconds=JOB_STALE_AFTER + 1)
+
+
+@task('jobs.tests.wait')
+def wait(seconds: float) -> str:
+    time.sleep(seconds)
+    return 'done'
+
+
+@task('jobs.tests.touched')
+def touched(seconds: float) -> bool:
+    """Whether the job has been touched while the handler was waiting."""
+    start = timezone.now()
+    time.sleep(seconds)
+    return Job.objects.get(name='jobs.tests.touched').updated > start
+
+
+@task('jobs.tests.fail')
+def fail() -> None:
+    raise ValueError
+
+
+class ClaimJobsTest(TestCase):
+
+    def running_job(self, attempts: int, idle: timedelta) -> Job:
+        job = Job.objects.create(name='jobs.tests.wait',
+                                 payload={'seconds': 0},
+                                 status=Job.Status.RUNNING,
+                                 attempts=attempts)
+        Job.objects.filter(pk=job.pk).update(updated=timezone.now() - idle)
+        return job
+
+    def test_stale_job_reclaimed(self):
+        job = self.running_job(attempts=1, idle=STALE)
+        self.assertEqual(claim_jobs(), [job])
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+
+    def test_running_job_kept(self):
+        self.running_job(attempts=1, idle=timedelta(0))
+        self.assertEqual(claim_jobs(), [])
+
+    def test_exhausted_stale_job_failed(self):
+        job = self.running_job(attempts=Job().max_attempts, idle=STALE)
+        self.assertEqual(claim_jobs(), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.error, JOB_ABANDONED_ERROR)
+
+
+class HeartbeatTest(TransactionTestCase):
+
+    @mock.patch('jobs.runner.JOB_HEARTBEAT_INTERVAL', 0.05)
+    def test_running_job_touched(self):
+        Job.objects.create(name='jobs.tests.touched',
+                           payload={'seconds': 0.3})
+        job, = claim_jobs()
+        run_job(job)
+        self.assertEqual(job.status, Job.Status.DONE)
+        self.assertIs(job.result, True)
+
+
+@override_settings(JOBS_EAGER=True)
+class EagerJobsTest(TestCase):
+
+    def test_claimed_before_run(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue('jobs.tests.wait', seconds=0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.result, 'done')
+
+    def test_retry_left_to_workers(self):
+        # The callbacks run when the inner block is left
+        with self.assertLogs('jobs.runner', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            job = enqueue('jobs.tests.fail')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('ValueError', job.error)
+
+    def test_claimed_by_a_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue('jobs.tests.wait', seconds=0)
+            # A worker takes it before the commit callbacks run
+            self.assertEqual(claim_jobs(), [job])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.RUNNING)
+        self.assertEqual(job.attempts, 1)
+
+    def test_scheduled_job_not_run(self):
+        run_after = timezone.now() + STALE
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue('jobs.tests.wait', run_after=run_after, seconds=0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertEqual(job.attempts, 0)
@@ -1,18 +1,26 @@
 from django.contrib import admin
 
 from .models import Ingredient, Recipe, Tag, ShoppingCart
+from .search import search_recipes
 
 
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'author', 'favorited',)
     list_display_links = ('name',)
     list_filter = ('author', 'name', 'tags',)
+    # Shows the search box, the lookup itself is full-text
     search_fields = ('name',)
     ordering = ('-id',)
 
-    @admin.display(description='Added to favorites')
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_recipes(queryset, search_term), False
+
+    @admin.display(description='Added to favorites',
+                   ordering='favorites_count')
     def favorited(self, instance):
-        return instance.favorite.count()
+        return instance.favorites_count
 
 
 class IngredientAdmin(admin.ModelAdmin):
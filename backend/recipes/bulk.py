@@ -0,0 +1,95 @@
+"""
+Changes of the recipe lists of a user: favorites and shopping cart.
+
+Every change is a single statement: the rows are inserted with
+ON CONFLICT DO NOTHING or deleted, and data-modifying common table
+expressions apply the work that the receivers in recipes.signals do for a
+single row -- the Recipe counter and the shopping list -- to exactly the
+rows RETURNING reports as changed. Concurrent duplicate requests therefore
+neither fail on the unique constraints nor count twice. No model signals
+are sent.
+"""
+from django.db import connection
+
+from .models import Favorite, Recipe, ShoppingCart
+from .shopping_list import add_items_cte, remove_items_ctes
+
+RECIPES = Recipe._meta.db_table
+
+# Denormalized counter of Recipe for every list
+COUNTERS = {Favorite: 'favorites_count', ShoppingCart: 'in_carts_count'}
+
+# Returned for the added recipes, as RecipeMinifiedSerializer shows them
+RECIPE_FIELDS = ['id', 'name', 'image', 'image_thumbnail', 'image_card',
+                 'cooking_time']
+
+
+def add_recipes(model, user_id: int,
+                recipe_ids: list[int]) -> list[Recipe]:
+    """
+    Add the existing recipes among recipe_ids to a list of the user.
+
+    Return the recipes that were not in the list before, with the fields
+    of RECIPE_FIELDS loaded.
+
+    Parameters:
+    - model (Model): Favorite or ShoppingCart.
+    - user_id (int): Owner of the list.
+    - recipe_ids (list of int): Recipes to add.
+    """
+    counter = COUNTERS[model]
+    ctes = [
+        f'added AS ('
+        f'INSERT INTO {model._meta.db_table} (user_id, recipe_id) '
+        f'SELECT %(user_id)s, id FROM {RECIPES} '
+        f'WHERE id = ANY(%(recipe_ids)s::bigint[]) '
+        f'ON CONFLICT (user_id, recipe_id) DO NOTHING '
+        f'RETURNING recipe_id)',
+        f'counted AS ('
+        f'UPDATE {RECIPES} SET {counter} = {counter} + 1 FROM added '
+        f'WHERE {RECIPES}.id = added.recipe_id '
+        f'RETURNING {", ".join(f"{RECIPES}.{f}" for f in RECIPE_FIELDS)})',
+    ]
+    if model is ShoppingCart:
+        ctes.append(add_items_cte('added'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH {", ".join(ctes)} '
+            f'SELECT {", ".join(RECIPE_FIELDS)} FROM counted',
+            {'user_id': user_id, 'recipe_ids': recipe_ids}
+        )
+        return [Recipe(**dict(zip(RECIPE_FIELDS, row)))
+                for row in cursor.fetchall()]
+
+
+def remove_recipes(model, user_id: int, recipe_ids: list[int]) -> list[int]:
+    """
+    Remove recipes from a list of the user.
+
+    Return the ids of the recipes that were in the list.
+
+    Parameters:
+    - model (Model): Favorite or ShoppingCart.
+    - user_id (int): Owner of the list.
+    - recipe_ids (list of int): Recipes to remove.
+    """
+    counter = COUNTERS[model]
+    ctes = [
+        f'removed AS ('
+        f'DELETE FROM {model._meta.db_table} '
+        f'WHERE user_id = %(user_id)s '
+        f'AND recipe_id = ANY(%(recipe_ids)s::bigint[]) '
+        f'RETURNING recipe_id)',
+        f'counted AS ('
+        f'UPDATE {RECIPES} SET {counter} = GREATEST({counter} - 1, 0) '
+        f'FROM removed WHERE {RECIPES}.id = removed.recipe_id '
+        f'RETURNING {RECIPES}.id)',
+    ]
+    if model is ShoppingCart:
+        ctes.append(remove_items_ctes('removed'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH {", ".join(ctes)} SELECT id FROM counted',
+            {'user_id': user_id, 'recipe_ids': recipe_ids}
+        )
+        return [recipe_id for recipe_id, in cursor.fetchall()]
@@ -16,3 +16,25 @@ TAG_NAME_MAX_LENGTH: int = 200
 TAG_COLOR_MAX_LENGTH: int = 7
 TAG_SLUG_MAX_LENGTH: int = 200
 TAG_DEFAULT_COLOR_CODE: str = '#ffffff'
+
+# images.py
+# Bounding boxes of the resized variants of a recipe image
+RECIPE_IMAGE_THUMBNAIL_SIZE: tuple[int, int] = (160, 160)
+RECIPE_IMAGE_CARD_SIZE: tuple[int, int] = (480, 480)
+RECIPE_IMAGE_VARIANT_QUALITY: int = 80
+
+# add_ingredients.py
+INGREDIENTS_BATCH_SIZE: int = 1000
+# Characters read from the file at a time
+INGREDIENTS_READ_CHUNK_SIZE: int = 64 * 1024
+
+# search.py
+# PostgreSQL text search configuration of the recipe search vector
+RECIPE_SEARCH_CONFIG: str = 'russian'
+
+# feed.py
+# Authors with more followers are not fanned out, their recipes are read
+# from the recipe table when a follower opens the feed
+FEED_FANOUT_MAX_FOLLOWERS: int = 10_000
+# Recipes of an author copied into a timeline on subscription
+FEED_BACKFILL_RECIPES: int = 100
@@ -0,0 +1,143 @@
+"""
+Maintenance of the subscription timelines (FeedEntry).
+
+A published recipe is copied into the timelines of the followers of its
+author with one INSERT ... SELECT (fan-out on write). Authors with more
+than FEED_FANOUT_MAX_FOLLOWERS followers are skipped: their recipes are
+merged into the feed when it is read (fan-out on read), so that a single
+publication never writes millions of rows.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from authors.models import CustomUserSubscribe
+from jobs.runner import enqueue
+
+from .constants import FEED_BACKFILL_RECIPES, FEED_FANOUT_MAX_FOLLOWERS
+from .models import FeedEntry, Recipe
+
+User = get_user_model()
+
+ENTRIES = FeedEntry._meta.db_table
+RECIPES = Recipe._meta.db_table
+SUBSCRIPTIONS = CustomUserSubscribe._meta.db_table
+USERS = User._meta.db_table
+
+# Matches the authors whose recipes are fanned out on write
+FANNED_OUT_AUTHOR = (f'(SELECT subscribers_count FROM {USERS} '
+                     f'WHERE id = %(author_id)s) <= %(max_followers)s')
+
+
+def large_followed_authors(user_id: int) -> list[int]:
+    """Return the followed authors whose recipes are not fanned out."""
+    return list(CustomUserSubscribe.objects
+                .filter(user_id=user_id,
+                        author__subscribers_count__gt=(
+                            FEED_FANOUT_MAX_FOLLOWERS))
+                .values_list('author_id', flat=True))
+
+
+def publish(recipe: Recipe) -> None:
+    """
+    Add a new recipe to the timelines of the followers of its author.
+
+    Parameters:
+    - recipe (Recipe): The recipe that has just been created.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ENTRIES} (user_id, recipe_id, author_id, pub_date) '
+            f'SELECT user_id, %(recipe_id)s, author_id, %(pub_date)s '
+            f'FROM {SUBSCRIPTIONS} WHERE author_id = %(author_id)s '
+            f'AND {FANNED_OUT_AUTHOR} '
+            f'ON CONFLICT (user_id, recipe_id) DO NOTHING',
+            {'recipe_id': recipe.id,
+             'author_id': recipe.author_id,
+             'pub_date': recipe.pub_date,
+             'max_followers': FEED_FANOUT_MAX_FOLLOWERS}
+        )
+
+
+def follow_cte(authors: str) -> str:
+    """
+    Return a common table expression backfilling the timeline of the
+    %(user_id)s user with the latest recipes of the newly followed authors,
+    so that it can be part of the statement that subscribes the user.
+
+    Parameters:
+    - authors (str): Name of a preceding common table expression with the
+    id and subscribers_count columns of the authors, the count including
+    the new follower.
+    """
+    return (f'followed AS ('
+            f'INSERT INTO {ENTRIES} (user_id, recipe_id, author_id, pub_date) '
+            f'SELECT %(user_id)s, recipe.id, recipe.author_id, '
+            f'recipe.pub_date '
+            f'FROM {authors} AS author, LATERAL ('
+            f' SELECT id, author_id, pub_date FROM {RECIPES} '
+            f' WHERE author_id = author.id '
+            f' ORDER BY pub_date DESC, id DESC '
+            f' LIMIT {FEED_BACKFILL_RECIPES}) AS recipe '
+            f'WHERE author.subscribers_count <= {FEED_FANOUT_MAX_FOLLOWERS} '
+            f'ON CONFLICT (user_id, recipe_id) DO NOTHING)')
+
+
+def follow(user_id: int, author_ids: list[int]) -> None:
+    """
+    Backfill the timeline of a new follower with the latest recipes of
+    each of the authors.
+
+    Parameters:
+    - user_id (int): The follower.
+    - author_ids (list of int): The newly followed authors.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH authors AS ('
+            f'SELECT id, subscribers_count FROM {USERS} '
+            f'WHERE id = ANY(%(author_ids)s::bigint[])), '
+            f'{follow_cte("authors")} '
+            f'SELECT 1',
+            {'user_id': user_id, 'author_ids': author_ids}
+        )
+
+
+def backfill_followers(author_id: int) -> None:
+    """
+    Backfill the timelines of all the followers of an author, for an
+    author who has fallen back under FEED_FANOUT_MAX_FOLLOWERS.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ENTRIES} (user_id, recipe_id, author_id, pub_date) '
+            f'SELECT follower.user_id, recipe.id, recipe.author_id, '
+            f'recipe.pub_date '
+            f'FROM {SUBSCRIPTIONS} AS follower, ('
+            f' SELECT id, author_id, pub_date FROM {RECIPES} '
+            f' WHERE author_id = %(author_id)s '
+            f' ORDER BY pub_date DESC, id DESC LIMIT %(limit)s) AS recipe '
+            f'WHERE follower.author_id = %(author_id)s '
+            f'AND {FANNED_OUT_AUTHOR} '
+            f'ON CONFLICT (user_id, recipe_id) DO NOTHING',
+            {'author_id': author_id,
+             'limit': FEED_BACKFILL_RECIPES,
+             'max_followers': FEED_FANOUT_MAX_FOLLOWERS}
+        )
+
+
+def unfollow(user_id: int, author_ids: list[int]) -> None:
+    """
+    Remove the recipes of the authors from the timeline of a former
+    follower, and catch up the timelines of the followers of any author
+    that has just fallen back under FEED_FANOUT_MAX_FOLLOWERS.
+
+    Must run after the subscribers_count of the authors is decremented.
+    """
+    FeedEntry.objects.filter(user_id=user_id,
+                             author_id__in=author_ids).delete()
+    caught_up = (User.objects
+                 .filter(id__in=author_ids,
+                         subscribers_count=FEED_FANOUT_MAX_FOLLOWERS)
+                 .values_list('id', flat=True))
+    for author_id in caught_up:
+        enqueue('recipes.backfill_feed', author_id=author_id)
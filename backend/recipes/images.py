@@ -0,0 +1,70 @@
+"""
+Resized variants of recipe images.
+
+The variants are generated once, right after an image is stored, so list
+views can serve small files instead of the full-size uploads. They are
+named after the content hash of the original image: an image that was
+already processed is detected by name and never decoded again.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+from .constants import (RECIPE_IMAGE_CARD_SIZE, RECIPE_IMAGE_THUMBNAIL_SIZE,
+                        RECIPE_IMAGE_VARIANT_QUALITY)
+from .models import Recipe
+
+# Model field: (variant suffix, bounding box)
+VARIANTS = {
+    'image_thumbnail': ('thumb', RECIPE_IMAGE_THUMBNAIL_SIZE),
+    'image_card': ('card', RECIPE_IMAGE_CARD_SIZE),
+}
+
+# WebP when Pillow is built with it, JPEG otherwise
+if features.check('webp'):
+    VARIANT_FORMAT, VARIANT_EXTENSION = 'WEBP', 'webp'
+else:
+    VARIANT_FORMAT, VARIANT_EXTENSION = 'JPEG', 'jpg'
+
+
+def encode_variant(image: Image.Image, size: tuple[int, int]) -> bytes:
+    variant = image.copy()
+    variant.thumbnail(size)
+    if VARIANT_FORMAT == 'JPEG' or variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGB')
+    buffer = BytesIO()
+    variant.save(buffer, VARIANT_FORMAT, quality=RECIPE_IMAGE_VARIANT_QUALITY)
+    return buffer.getvalue()
+
+
+def build_image_variants(recipe: Recipe) -> None:
+    """
+    Generate and store the resized variants of the recipe image and
+    save their names on the recipe.
+
+    Parameters:
+    - recipe (Recipe): Recipe whose image has been stored.
+    """
+    if not recipe.image:
+        return
+    stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    storage = recipe.image.storage
+    paths = {
+        field: getattr(recipe, field).field.generate_filename(
+            recipe, f'{stem}_{suffix}.{VARIANT_EXTENSION}')
+        for field, (suffix, size) in VARIANTS.items()
+    }
+    missing = [field for field, path in paths.items()
+               if not storage.exists(path)]
+    if missing:
+        with recipe.image.open('rb'), Image.open(recipe.image) as image:
+            image = ImageOps.exif_transpose(image)
+            for field in missing:
+                content = encode_variant(image, VARIANTS[field][1])
+                paths[field] = storage.save(paths[field],
+                                            ContentFile(content))
+    for field, path in paths.items():
+        setattr(recipe, field, path)
+    recipe.save(update_fields=list(VARIANTS))
@@ -1,9 +1,120 @@
+import csv
 import json
+import re
 from pathlib import Path
+from typing import Iterator
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from recipes.constants import (INGREDIENTS_BATCH_SIZE,
+                               INGREDIENTS_READ_CHUNK_SIZE)
 from recipes.models import Ingredient
+from recipes.signals import ingredients_loaded
+
+# Whitespace and commas between the items of a JSON array
+SEPARATORS = re.compile(r'[\s,]*')
+WHITESPACE = re.compile(r'\s*')
+
+CSV_HEADER = ['name', 'measurement_unit']
+
+
+class InvalidRecord(ValueError):
+    """A part of the file that can not be loaded, with its line number."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f'line {line}: {message}')
+
+
+def iter_json_array(file) -> Iterator[tuple[int, object]]:
+    """
+    Yield the items of a top-level JSON array one by one with the number
+    of the line they start on, reading the file in chunks instead of
+    loading the whole document.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(INGREDIENTS_READ_CHUNK_SIZE)
+    position = WHITESPACE.match(buffer).end()
+    # Line of the file at the counted position of the buffer
+    line = 1 + buffer.count('\n', 0, position)
+    counted = position
+    if not buffer.startswith('[', position):
+        raise InvalidRecord(line, 'the file must contain a JSON array')
+    position += 1
+    eof = False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        line += buffer.count('\n', counted, position)
+        counted = position
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as error:
+            if eof:
+                raise InvalidRecord(
+                    line + buffer.count('\n', counted, error.pos),
+                    error.msg)
+            chunk = file.read(INGREDIENTS_READ_CHUNK_SIZE)
+            eof = not chunk
+            # Drop what has been parsed and append the next chunk
+            buffer, position, counted = buffer[position:] + chunk, 0, 0
+            continue
+        yield line, item
+
+
+def read_json(file) -> Iterator[tuple[str, str]]:
+    for line, item in iter_json_array(file):
+        record = (tuple(item.get(key) for key in CSV_HEADER)
+                  if isinstance(item, dict) else ())
+        if not record or not all(isinstance(value, str)
+                                 for value in record):
+            raise InvalidRecord(line, 'expected an object with the string '
+                                      'name and measurement_unit')
+        yield record
+
+
+def read_csv(file) -> Iterator[tuple[str, str]]:
+    reader = csv.reader(file)
+    try:
+        for row in reader:
+            if not row or row == CSV_HEADER:
+                continue
+            if len(row) != len(CSV_HEADER):
+                raise InvalidRecord(reader.line_num,
+                                    f'expected {len(CSV_HEADER)} fields, '
+                                    f'got {len(row)}')
+            name, measurement_unit = row
+            yield name, measurement_unit
+    except csv.Error as error:
+        raise InvalidRecord(reader.line_num, str(error))
+
+
+READERS = {'json': read_json, 'csv': read_csv}
+
+
+class CSVStream:
+    """File-like object rendering (name, unit) records as CSV for COPY."""
+
+    def __init__(self, records: Iterator[tuple[str, str]]):
+        self.records = records
+        self.buffer = ''
+        self.count = 0
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.buffer) < size:
+            record = next(self.records, None)
+            if record is None:
+                break
+            self.count += 1
+            self.buffer += '"{}","{}"\n'.format(
+                *(value.replace('"', '""') for value in record))
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    readline = read
 
 
 class Command(BaseCommand):
@@ -16,25 +127,87 @@ class Command(BaseCommand):
                             type=str,
                             nargs='?',
                             default=default_file_path,
-                            help='Optional JSON file path')
+                            help='Optional JSON or CSV file path')
+        parser.add_argument('--format',
+                            choices=list(READERS),
+                            help='File format, taken from the file '
+                                 'extension by default')
+        parser.add_argument('--batch-size',
+                            type=int,
+                            default=INGREDIENTS_BATCH_SIZE,
+                            help='Number of rows inserted per query')
+        parser.add_argument('--copy',
+                            action='store_true',
+                            help='Load the rows with PostgreSQL COPY '
+                                 'through a temporary table')
+
+    def insert_batches(self, records, batch_size: int) -> int:
+        """Insert the records batch by batch, skipping existing ones."""
+        processed = 0
+        batch = []
+        for name, measurement_unit in records:
+            batch.append(Ingredient(name=name,
+                                    measurement_unit=measurement_unit))
+            if len(batch) >= batch_size:
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                processed += len(batch)
+                batch = []
+                self.stdout.write(f'Processed {processed} rows')
+        if batch:
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            processed += len(batch)
+        return processed
+
+    def copy(self, records) -> int:
+        """Stream the records into a temporary table with COPY and merge
+        them into the catalogue with a single INSERT."""
+        table = Ingredient._meta.db_table
+        stream = CSVStream(records)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredients_import '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredients_import (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                stream
+            )
+            self.stdout.write(f'Copied {stream.count} rows')
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT name, measurement_unit FROM ingredients_import '
+                f'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+        return stream.count
 
     def handle(self, *args, **options):
         # By default the file is in the volume: <root>/backend_static/data/
         file_name = options.get('filename')
+        file_format = (options.get('format')
+                       or Path(file_name).suffix.lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(f'Unknown file format: {file_format}')
         self.stdout.write(f'Reading a file: {self.style.NOTICE(file_name)}')
         try:
-            with open(file_name, "r", encoding='utf-8') as file:
-                data = json.load(file)
-            ingredients = [
-                Ingredient(
-                    name=ingredient.get('name'),
-                    measurement_unit=ingredient.get('measurement_unit')
-                ) for ingredient in data
-            ]
-            Ingredient.objects.bulk_create(ingredients)
-            message = 'Ingredients have been successfully added!'
+            before = Ingredient.objects.count()
+            with open(file_name, 'r', encoding='utf-8', newline='') as file:
+                records = READERS[file_format](file)
+                if options.get('copy'):
+                    processed = self.copy(records)
+                else:
+                    processed = self.insert_batches(records,
+                                                    options.get('batch_size'))
+            added = Ingredient.objects.count() - before
+            if added:
+                # Bulk inserts send no post_save
+                ingredients_loaded.send(sender=Ingredient)
+            message = (f'Ingredients have been successfully added! '
+                       f'Processed: {processed}, new: {added}')
             self.stdout.write(self.style.SUCCESS(message))
         except FileNotFoundError:
             raise CommandError(f'File {file_name} does not exist')
+        except InvalidRecord as error:
+            raise CommandError(f'File {file_name}, {error}')
         except Exception as error:
             raise CommandError(f'An error occurred: {error}')
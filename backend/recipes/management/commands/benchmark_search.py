@@ -0,0 +1,122 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from recipes.constants import RECIPE_SEARCH_CONFIG
+from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
+
+User = get_user_model()
+
+# Words of the synthetic recipes are picked from the vocabulary by index,
+# a few multiplications away from the row number, so that every row gets
+# a different but reproducible name and text
+SYNTHETIC_RECIPES_SQL = '''
+INSERT INTO {table} (author_id, pub_date, name, text, cooking_time,
+                     image, image_thumbnail, image_card,
+                     favorites_count, in_carts_count, search_vector)
+SELECT %(author_id)s, now() - make_interval(secs => n), name, text,
+       1 + n %% 120, '', '', '', 0, 0,
+       setweight(to_tsvector(%(config)s::regconfig, name), 'A')
+       || setweight(to_tsvector(%(config)s::regconfig, text), 'C')
+FROM (
+    SELECT n,
+           (%(words)s::text[])[1 + (n * 7 + %(seed)s) %% %(size)s]
+           || ' ' ||
+           (%(words)s::text[])[1 + (n * 13 + %(seed)s) %% %(size)s] AS name,
+           (SELECT string_agg(
+                (%(words)s::text[])[1 + (n * k * 31 + k + %(seed)s)
+                                    %% %(size)s], ' ')
+            FROM generate_series(1, %(text_words)s) AS k) AS text
+    FROM generate_series(1, %(recipes)s) AS n
+) AS synthetic
+'''
+
+
+class Command(BaseCommand):
+    help = ('Compare recipe search on a synthetic corpus: full-text '
+            'search on the GIN index against icontains')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes',
+                            type=int,
+                            default=1_000_000,
+                            help='Number of synthetic recipes')
+        parser.add_argument('--queries',
+                            type=int,
+                            default=50,
+                            help='Number of searches to run')
+        parser.add_argument('--text-words',
+                            type=int,
+                            default=30,
+                            help='Number of words in a recipe text')
+        parser.add_argument('--seed',
+                            type=int,
+                            default=0,
+                            help='Random seed for the corpus and queries')
+
+    @staticmethod
+    def measure(lookup, words: list[str]) -> list[float]:
+        timings = []
+        for word in words:
+            start = time.perf_counter()
+            lookup(word)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def report(self, label: str, timings: list[float]) -> None:
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        self.stdout.write(f'{label:<10} mean {statistics.mean(timings):.3f} '
+                          f'ms, p95 {p95:.3f} ms')
+
+    def populate(self, words: list[str], options: dict) -> None:
+        author = User.objects.create(username='search-benchmark',
+                                     email='search-benchmark@example.com')
+        table = Recipe._meta.db_table
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SYNTHETIC_RECIPES_SQL.format(table=table),
+                {'author_id': author.id,
+                 'config': RECIPE_SEARCH_CONFIG,
+                 'words': words,
+                 'size': len(words),
+                 'seed': options.get('seed'),
+                 'text_words': options.get('text_words'),
+                 'recipes': options.get('recipes')}
+            )
+            cursor.execute(f'ANALYZE {table}')
+        self.stdout.write(f'Generated {options.get("recipes")} recipes in '
+                          f'{time.perf_counter() - start:.1f} s')
+
+    def handle(self, *args, **options):
+        words = sorted({word for name in
+                        Ingredient.objects.values_list('name', flat=True)
+                        for word in name.split() if len(word) > 3})
+        if not words:
+            raise CommandError('The ingredient catalogue is empty')
+        random.seed(options.get('seed'))
+        queries = random.choices(words, k=options.get('queries'))
+        page = slice(0, 10)
+
+        def full_text_lookup(word):
+            return list(search_recipes(Recipe.objects.all(), word)
+                        .values('id', 'name')[page])
+
+        def icontains_lookup(word):
+            return list(Recipe.objects
+                        .filter(Q(name__icontains=word)
+                                | Q(text__icontains=word))
+                        .values('id', 'name')[page])
+
+        # Everything is rolled back, the corpus only lives for the run
+        with transaction.atomic():
+            self.populate(words, options)
+            self.report('full-text', self.measure(full_text_lookup, queries))
+            self.report('icontains', self.measure(icontains_lookup, queries))
+            transaction.set_rollback(True)
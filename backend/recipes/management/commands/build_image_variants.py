@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import build_image_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized image variants missing from recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all',
+                            action='store_true',
+                            help='Process every recipe, not only the ones '
+                                 'without variants')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options.get('all'):
+            recipes = recipes.filter(image_card='')
+        total = 0
+        for recipe in recipes.iterator():
+            try:
+                build_image_variants(recipe)
+                total += 1
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Recipe {recipe.id}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Image variants have been built for {total} recipes'))
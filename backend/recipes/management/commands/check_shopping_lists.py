@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from recipes.shopping_list import EXPECTED_ITEMS_SQL, ITEMS
+
+DIFF_SQL = (
+    f'SELECT '
+    f'COUNT(*) FILTER (WHERE item.amount IS NULL), '
+    f'COUNT(*) FILTER (WHERE expected.amount IS NULL), '
+    f'COUNT(*) FILTER (WHERE item.amount <> expected.amount) '
+    f'FROM {ITEMS} AS item '
+    f'FULL OUTER JOIN expected_shopping_list AS expected '
+    f'ON expected.user_id = item.user_id '
+    f'AND expected.ingredient_id = item.ingredient_id'
+)
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the shopping lists from scratch and compare them '
+            'with the incrementally maintained ones')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair',
+                            action='store_true',
+                            help='Replace the maintained rows with the '
+                                 'rebuilt ones when they differ')
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE expected_shopping_list '
+                f'ON COMMIT DROP AS {EXPECTED_ITEMS_SQL}'
+            )
+            self.compare(cursor, options.get('repair'))
+            # ON COMMIT DROP waits for the outermost transaction, which
+            # does not end here when the command is called inside another
+            cursor.execute('DROP TABLE expected_shopping_list')
+
+    def compare(self, cursor, repair: bool) -> None:
+        cursor.execute(DIFF_SQL)
+        missing, extra, different = cursor.fetchone()
+        self.stdout.write(f'Missing rows: {missing}\n'
+                          f'Extra rows: {extra}\n'
+                          f'Rows with a different amount: {different}')
+        if not (missing or extra or different):
+            self.stdout.write(self.style.SUCCESS(
+                'The shopping lists are consistent'))
+            return
+        if not repair:
+            self.stdout.write(self.style.WARNING(
+                'The shopping lists have drifted, '
+                'run with --repair to fix them'))
+            return
+        cursor.execute(f'DELETE FROM {ITEMS}')
+        cursor.execute(
+            f'INSERT INTO {ITEMS} (user_id, ingredient_id, amount) '
+            f'SELECT user_id, ingredient_id, amount '
+            f'FROM expected_shopping_list'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'The shopping lists have been rebuilt'))
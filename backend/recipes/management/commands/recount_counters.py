@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from authors.models import CustomUserSubscribe
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+User = get_user_model()
+
+# (model, counter field, counted model, FK of the counted model)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', CustomUserSubscribe, 'author'),
+)
+
+
+def actual_count(counted_model, fk: str):
+    """Correlated subquery counting the rows that reference OuterRef."""
+    return Coalesce(
+        Subquery(counted_model.objects
+                 .filter(**{fk: OuterRef('pk')})
+                 .order_by()
+                 .values(fk)
+                 .annotate(total=Count('pk'))
+                 .values('total')),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized counters and repair the drifted ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run',
+                            action='store_true',
+                            help='Only report drifted rows, do not fix them')
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run')
+        for model, field, counted_model, fk in COUNTERS:
+            label = f'{model._meta.model_name}.{field}'
+            with transaction.atomic():
+                drifted = (model.objects
+                           .annotate(actual=actual_count(counted_model, fk))
+                           .exclude(**{field: F('actual')})
+                           .values('pk'))
+                if dry_run:
+                    total = drifted.count()
+                else:
+                    total = model.objects.filter(pk__in=drifted).update(
+                        **{field: actual_count(counted_model, fk)}
+                    )
+            style = self.style.WARNING if total else self.style.SUCCESS
+            verb = 'drifted' if dry_run else 'repaired'
+            self.stdout.write(style(f'{label}: {total} rows {verb}'))
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:49
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_rows(model, fk):
+    return Coalesce(Subquery(model.objects
+                             .filter(**{fk: OuterRef('pk')})
+                             .order_by()
+                             .values(fk)
+                             .annotate(total=Count('pk'))
+                             .values('total')), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    CustomUser = apps.get_model('authors', 'CustomUser')
+    CustomUserSubscribe = apps.get_model('authors', 'CustomUserSubscribe')
+    Recipe.objects.update(favorites_count=count_rows(Favorite, 'recipe'),
+                          in_carts_count=count_rows(ShoppingCart, 'recipe'))
+    CustomUser.objects.update(
+        recipes_count=count_rows(Recipe, 'author'),
+        subscribers_count=count_rows(CustomUserSubscribe, 'author')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authors', '0005_customuser_recipes_count_and_more'),
+        ('recipes', '0008_alter_recipeingredient_recipe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_alter_recipe_options_recipe_recipe_pub_date_id_desc'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='Кол-во')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Позиция списка покупок',
+                'verbose_name_plural': 'Позиции списков покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='Unique ingredient in shopping list'),
+        ),
+        migrations.RunSQL(
+            sql=('INSERT INTO recipes_shoppinglistitem '
+                 '(user_id, ingredient_id, amount) '
+                 'SELECT cart.user_id, recipe_ingredient.ingredient_id, '
+                 'SUM(recipe_ingredient.amount) '
+                 'FROM recipes_shoppingcart AS cart '
+                 'JOIN recipes_recipeingredient AS recipe_ingredient '
+                 'ON recipe_ingredient.recipe_id = cart.recipe_id '
+                 'GROUP BY cart.user_id, recipe_ingredient.ingredient_id'),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
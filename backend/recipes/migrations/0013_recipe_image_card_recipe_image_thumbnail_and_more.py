@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:55
+
+import recipes.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_shoppinglistitem_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_card',
+            field=models.ImageField(blank=True, storage=recipes.storage.content_addressed_storage, upload_to=recipes.storage.recipe_image_path, verbose_name='Изображение для карточки'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, storage=recipes.storage.content_addressed_storage, upload_to=recipes.storage.recipe_image_path, verbose_name='Миниатюра'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(default=None, storage=recipes.storage.content_addressed_storage, upload_to=recipes.storage.recipe_image_path, verbose_name='Изображение'),
+        ),
+    ]
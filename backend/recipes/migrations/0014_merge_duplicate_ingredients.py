@@ -0,0 +1,56 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:58
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_rows(model, owner_field, ingredient_ids, keep_id):
+    """Point the rows at the kept ingredient, adding up the amounts of
+    the rows that would collide with an existing one."""
+    for row in model.objects.filter(ingredient_id__in=ingredient_ids):
+        kept = model.objects.filter(
+            **{owner_field: getattr(row, owner_field)},
+            ingredient_id=keep_id
+        ).first()
+        if kept:
+            kept.amount += row.amount
+            kept.save(update_fields=['amount'])
+            row.delete()
+        else:
+            row.ingredient_id = keep_id
+            row.save(update_fields=['ingredient'])
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    groups = (Ingredient.objects
+              .values('name', 'measurement_unit')
+              .annotate(keep_id=Min('id'), total=Count('id'))
+              .filter(total__gt=1))
+    for group in groups:
+        duplicates = list(
+            Ingredient.objects
+            .filter(name=group['name'],
+                    measurement_unit=group['measurement_unit'])
+            .exclude(id=group['keep_id'])
+            .values_list('id', flat=True)
+        )
+        merge_rows(RecipeIngredient, 'recipe_id', duplicates,
+                   group['keep_id'])
+        merge_rows(ShoppingListItem, 'user_id', duplicates,
+                   group['keep_id'])
+        Ingredient.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_image_card_recipe_image_thumbnail_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_ingredient_unique_ingredient_with_measurement_unit'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        # Index the existing recipes before building the GIN index
+        migrations.RunSQL(
+            sql=("UPDATE recipes_recipe AS recipe SET search_vector = "
+                 "setweight(to_tsvector('russian', recipe.name), 'A') || "
+                 "setweight(to_tsvector('russian', COALESCE(("
+                 "SELECT string_agg(ingredient.name, ' ') "
+                 "FROM recipes_recipeingredient AS recipe_ingredient "
+                 "JOIN recipes_ingredient AS ingredient "
+                 "ON ingredient.id = recipe_ingredient.ingredient_id "
+                 "WHERE recipe_ingredient.recipe_id = recipe.id), '')), "
+                 "'B') || "
+                 "setweight(to_tsvector('russian', recipe.text), 'C')"),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipeingredient_ingredient'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('authors', '0005_customuser_recipes_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи лент',
+                'ordering': ['-pub_date', '-id'],
+                'indexes': [models.Index(fields=['user', '-pub_date', '-id'], name='feedentry_user_pub_date')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='Unique recipe in feed'),
+        ),
+        # Timelines of the existing subscriptions: the 100 latest recipes
+        # of every followed author with at most 10 000 followers
+        migrations.RunSQL(
+            sql=('INSERT INTO recipes_feedentry '
+                 '(user_id, recipe_id, author_id, pub_date) '
+                 'SELECT user_id, recipe_id, author_id, pub_date FROM ('
+                 'SELECT subscription.user_id, recipe.id AS recipe_id, '
+                 'recipe.author_id, recipe.pub_date, '
+                 'ROW_NUMBER() OVER (PARTITION BY subscription.id '
+                 'ORDER BY recipe.pub_date DESC, recipe.id DESC) AS number '
+                 'FROM authors_customusersubscribe AS subscription '
+                 'JOIN authors_customuser AS author '
+                 'ON author.id = subscription.author_id '
+                 'JOIN recipes_recipe AS recipe '
+                 'ON recipe.author_id = subscription.author_id '
+                 'WHERE author.subscribers_count <= 10000) AS latest '
+                 'WHERE number <= 100'),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,11 +1,15 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.functions import Upper
 
 from .constants import (INGREDIENT_NAME_MAX_LENGTH, INGREDIENT_UNIT_MAX_LENGTH,
                         TAG_NAME_MAX_LENGTH, TAG_COLOR_MAX_LENGTH,
                         TAG_DEFAULT_COLOR_CODE, TAG_SLUG_MAX_LENGTH,
                         RECIPE_NAME_MAX_LENGTH, RECIPE_TEXT_MAX_LENGTH)
+from .storage import content_addressed_storage, recipe_image_path
 
 User = get_user_model()
 
@@ -20,6 +24,17 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        indexes = [
+            # Serves the case-insensitive prefix search of the API,
+            # UPPER(name) LIKE 'X%', which the plain index can not use
+            models.Index(OpClass(Upper('name'), name='text_pattern_ops'),
+                         name='ingredient_name_upper_prefix'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='Unique ingredient with measurement unit')
+        ]
 
     def __str__(self):
         return self.name
@@ -61,8 +76,18 @@ class Recipe(models.Model):
         validators=[MinValueValidator(1)]
     )
     image = models.ImageField('Изображение',
-                              upload_to='recipes/images/',
+                              upload_to=recipe_image_path,
+                              storage=content_addressed_storage,
                               default=None)
+    # Resized copies generated once by recipes.images
+    image_thumbnail = models.ImageField('Миниатюра',
+                                        upload_to=recipe_image_path,
+                                        storage=content_addressed_storage,
+                                        blank=True)
+    image_card = models.ImageField('Изображение для карточки',
+                                   upload_to=recipe_image_path,
+                                   storage=content_addressed_storage,
+                                   blank=True)
     ingredients = models.ManyToManyField(to=Ingredient,
                                          through='RecipeIngredient',
                                          related_name='recipes',
@@ -70,11 +95,31 @@ class Recipe(models.Model):
     tags = models.ManyToManyField(to=Tag,
                                   related_name='recipes',
                                   verbose_name='Теги',)
+    # Denormalized counters, maintained by recipes.signals
+    favorites_count = models.PositiveIntegerField('В избранном',
+                                                  default=0)
+    in_carts_count = models.PositiveIntegerField('В списках покупок',
+                                                 default=0)
+    # Name, ingredient names and text, maintained by recipes.signals
+    search_vector = SearchVectorField('Поисковый вектор',
+                                      null=True,
+                                      editable=False)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            # Default order of the recipe list
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_desc'),
+            # The most favorited recipes first, see api.filters
+            models.Index(fields=['-favorites_count', '-id'],
+                         name='recipe_favorites_count_id_desc'),
+            # Full-text search, see recipes.search
+            GinIndex(fields=['search_vector'],
+                     name='recipe_search_vector'),
+        ]
 
     def __str__(self):
         return self.name
@@ -83,11 +128,14 @@ class Recipe(models.Model):
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(to=Recipe,
                                on_delete=models.CASCADE,
+                               related_name='recipe_ingredients',
                                verbose_name='Рецепт')
+    # Indexed by recipeingredient_ingredient below
     ingredient = models.ForeignKey(to=Ingredient,
                                    on_delete=models.CASCADE,
                                    related_name='ingredient_in_recipe',
-                                   verbose_name='Ингредиент')
+                                   verbose_name='Ингредиент',
+                                   db_index=False)
     amount = models.PositiveIntegerField('Кол-во')
 
     class Meta:
@@ -98,6 +146,12 @@ class RecipeIngredient(models.Model):
                 fields=['recipe', 'ingredient'],
                 name='Unique ingredient in recipe')
         ]
+        indexes = [
+            # Recipes by ingredient with index-only scans, see
+            # api.filters.RecipeFilterSet
+            models.Index(fields=['ingredient', 'recipe'],
+                         name='recipeingredient_ingredient'),
+        ]
 
     def __str__(self):
         # Ингредиент мука в рецепте Пирог с яблоками. Кол-во: 350 (г)
@@ -154,3 +208,77 @@ class ShoppingCart(models.Model):
         # у пользователя Вася Пупкин (ID:5)
         return (f'Рецепт {self.recipe} (ID:{self.recipe.id}) в списке покупок '
                 f'у пользователя {self.user} (ID:{self.user.id})')
+
+
+class ShoppingListItem(models.Model):
+    """
+    Total amount of an ingredient over all the recipes in a user's shopping
+    cart. The table is a materialized aggregate of ShoppingCart and
+    RecipeIngredient, kept up to date by recipes.shopping_list.
+    """
+    user = models.ForeignKey(to=User,
+                             on_delete=models.CASCADE,
+                             related_name='shopping_list',
+                             verbose_name='Пользователь')
+    ingredient = models.ForeignKey(to=Ingredient,
+                                   on_delete=models.CASCADE,
+                                   related_name='+',
+                                   verbose_name='Ингредиент')
+    amount = models.IntegerField('Кол-во')
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='Unique ingredient in shopping list')
+        ]
+
+    def __str__(self):
+        # Мука: 350 (г) в списке покупок у пользователя Вася Пупкин (ID:5)
+        return (f'{self.ingredient}: {self.amount} '
+                f'({self.ingredient.measurement_unit}) в списке покупок '
+                f'у пользователя {self.user} (ID:{self.user.id})')
+
+
+class FeedEntry(models.Model):
+    """
+    Recipe in the timeline of a follower of its author. The table is
+    written on recipe publication and subscription changes by recipes.feed
+    and read with a range scan of the (user, -pub_date, -id) index.
+    """
+    user = models.ForeignKey(to=User,
+                             on_delete=models.CASCADE,
+                             related_name='feed_entries',
+                             verbose_name='Пользователь')
+    recipe = models.ForeignKey(to=Recipe,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='Рецепт')
+    # Copies of the recipe fields, to prune and sort without a join
+    author = models.ForeignKey(to=User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               db_index=False,
+                               verbose_name='Автор')
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        ordering = ['-pub_date', '-id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='Unique recipe in feed')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-id'],
+                         name='feedentry_user_pub_date'),
+        ]
+
+    def __str__(self):
+        # Пирог с яблоками в ленте пользователя Вася Пупкин (ID:5)
+        return (f'{self.recipe} в ленте пользователя {self.user} '
+                f'(ID:{self.user.id})')
@@ -0,0 +1,61 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db.models import (F, OuterRef, QuerySet, Subquery, TextField,
+                              Value)
+from django.db.models.functions import Coalesce
+
+from .constants import RECIPE_SEARCH_CONFIG
+from .models import Recipe, RecipeIngredient
+
+
+def recipe_search_vector() -> SearchVector:
+    """
+    Return the expression of the search vector of a recipe: the name
+    weighs the most, then the ingredient names, then the text.
+    """
+    ingredient_names = Subquery(
+        RecipeIngredient.objects
+        .filter(recipe=OuterRef('pk'))
+        .values('recipe')
+        .annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=RECIPE_SEARCH_CONFIG)
+        + SearchVector(Coalesce(ingredient_names, Value(''),
+                                output_field=TextField()),
+                       weight='B', config=RECIPE_SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=RECIPE_SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids) -> None:
+    """
+    Recompute the stored search vector of the given recipes with a single
+    UPDATE.
+
+    Parameters:
+    - recipe_ids (list of int | QuerySet): The recipes to update.
+    """
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        search_vector=recipe_search_vector())
+
+
+def search_recipes(queryset: QuerySet, text: str) -> QuerySet:
+    """
+    Narrow the recipes down to those matching the search text, the best
+    matches first.
+
+    The text follows the web search syntax: "quoted phrases", OR and -word
+    are supported. The match uses the GIN index on search_vector.
+
+    Parameters:
+    - queryset (QuerySet): Recipes to search in.
+    - text (str): The search text.
+    """
+    query = SearchQuery(text, config=RECIPE_SEARCH_CONFIG,
+                        search_type='websearch')
+    return (queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F('search_vector'), query))
+            .order_by('-search_rank', *Recipe._meta.ordering))
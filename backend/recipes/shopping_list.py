@@ -0,0 +1,181 @@
+"""
+Maintenance of the materialized shopping lists (ShoppingListItem).
+
+Every change is applied as a delta in a single SQL statement, so adding a
+recipe to a cart or editing a recipe touches only the affected rows and
+concurrent changes of the same row add up instead of overwriting each
+other. Rows whose total drops to zero are removed.
+"""
+from django.db import connection
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+ITEMS = ShoppingListItem._meta.db_table
+RECIPE_INGREDIENTS = RecipeIngredient._meta.db_table
+CARTS = ShoppingCart._meta.db_table
+
+
+# Turns the %(recipe_ids)s parameter into a recipe_id table for the CTEs
+SELECTED_RECIPES = ('selected_recipes AS ('
+                    'SELECT UNNEST(%(recipe_ids)s::bigint[]) AS recipe_id)')
+
+
+def add_items_cte(recipes: str) -> str:
+    """
+    Return a common table expression adding the ingredients of the recipes
+    to the shopping list of the %(user_id)s user, so that the change can
+    be part of the statement that puts the recipes into the cart.
+
+    Parameters:
+    - recipes (str): Name of a preceding common table expression with a
+    recipe_id column.
+    """
+    return (f'items_added AS ('
+            f'INSERT INTO {ITEMS} (user_id, ingredient_id, amount) '
+            f'SELECT %(user_id)s, ingredient_id, SUM(amount) '
+            f'FROM {RECIPE_INGREDIENTS} '
+            f'WHERE recipe_id IN (SELECT recipe_id FROM {recipes}) '
+            f'GROUP BY ingredient_id '
+            f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+            f'SET amount = {ITEMS}.amount + EXCLUDED.amount '
+            f'RETURNING ingredient_id)')
+
+
+def remove_items_ctes(recipes: str) -> str:
+    """
+    Return common table expressions subtracting the ingredients of the
+    recipes from the shopping list of the %(user_id)s user. Must run while
+    the RecipeIngredient rows still exist.
+
+    A statement may change a row only once, so the rows whose total drops
+    to zero are deleted and the others updated by two expressions over
+    disjoint sets of rows.
+
+    Parameters:
+    - recipes (str): Name of a preceding common table expression with a
+    recipe_id column.
+    """
+    matching_item = (f'{ITEMS}.user_id = %(user_id)s '
+                     f'AND {ITEMS}.ingredient_id = items_delta.ingredient_id')
+    return (f'items_delta AS ('
+            f'SELECT ingredient_id, SUM(amount) AS total '
+            f'FROM {RECIPE_INGREDIENTS} '
+            f'WHERE recipe_id IN (SELECT recipe_id FROM {recipes}) '
+            f'GROUP BY ingredient_id), '
+            f'items_emptied AS ('
+            f'DELETE FROM {ITEMS} USING items_delta '
+            f'WHERE {matching_item} '
+            f'AND {ITEMS}.amount <= items_delta.total '
+            f'RETURNING {ITEMS}.ingredient_id), '
+            f'items_lowered AS ('
+            f'UPDATE {ITEMS} SET amount = {ITEMS}.amount - items_delta.total '
+            f'FROM items_delta '
+            f'WHERE {matching_item} '
+            f'AND {ITEMS}.amount > items_delta.total '
+            f'RETURNING {ITEMS}.ingredient_id)')
+
+
+def add_recipes(user_id: int, recipe_ids: list[int]) -> None:
+    """
+    Add the ingredients of the recipes to the shopping list of a user.
+
+    Parameters:
+    - user_id (int): Owner of the shopping cart.
+    - recipe_ids (list of int): Recipes that were put into the cart.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH {SELECTED_RECIPES}, {add_items_cte("selected_recipes")} '
+            f'SELECT 1',
+            {'user_id': user_id, 'recipe_ids': recipe_ids}
+        )
+
+
+def remove_recipes(user_id: int, recipe_ids: list[int]) -> None:
+    """
+    Subtract the ingredients of the recipes from the shopping list of a
+    user. Must run while the RecipeIngredient rows still exist.
+
+    Parameters:
+    - user_id (int): Owner of the shopping cart.
+    - recipe_ids (list of int): Recipes that are taken out of the cart.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH {SELECTED_RECIPES}, '
+            f'{remove_items_ctes("selected_recipes")} '
+            f'SELECT 1',
+            {'user_id': user_id, 'recipe_ids': recipe_ids}
+        )
+
+
+def ingredient_deltas(old: dict[int, int],
+                      new: dict[int, int]) -> dict[int, int]:
+    """
+    Return the change of amount for every ingredient whose amount differs
+    between two {ingredient id: amount} mappings of a recipe.
+    """
+    deltas = {}
+    for ingredient_id in old.keys() | new.keys():
+        delta = new.get(ingredient_id, 0) - old.get(ingredient_id, 0)
+        if delta:
+            deltas[ingredient_id] = delta
+    return deltas
+
+
+def change_recipe(recipe_id: int, deltas: dict[int, int]) -> None:
+    """
+    Apply the changed ingredient amounts of a recipe to the shopping lists
+    of all users who have the recipe in their cart.
+
+    Parameters:
+    - recipe_id (int): The edited recipe.
+    - deltas (dict): {ingredient id: change of amount}, as returned by
+    ingredient_deltas().
+    """
+    if not deltas:
+        return
+    added = {key: value for key, value in deltas.items() if value > 0}
+    removed = {key: -value for key, value in deltas.items() if value < 0}
+    with connection.cursor() as cursor:
+        if added:
+            cursor.execute(
+                f'INSERT INTO {ITEMS} (user_id, ingredient_id, amount) '
+                f'SELECT cart.user_id, delta.ingredient_id, delta.amount '
+                f'FROM {CARTS} AS cart '
+                f'CROSS JOIN UNNEST(%s::bigint[], %s::integer[]) '
+                f'AS delta (ingredient_id, amount) '
+                f'WHERE cart.recipe_id = %s '
+                f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET amount = {ITEMS}.amount + EXCLUDED.amount',
+                [list(added), list(added.values()), recipe_id]
+            )
+        if removed:
+            cursor.execute(
+                f'UPDATE {ITEMS} SET amount = {ITEMS}.amount - delta.amount '
+                f'FROM {CARTS} AS cart, '
+                f'UNNEST(%s::bigint[], %s::integer[]) '
+                f'AS delta (ingredient_id, amount) '
+                f'WHERE cart.recipe_id = %s '
+                f'AND {ITEMS}.user_id = cart.user_id '
+                f'AND {ITEMS}.ingredient_id = delta.ingredient_id',
+                [list(removed), list(removed.values()), recipe_id]
+            )
+            cursor.execute(
+                f'DELETE FROM {ITEMS} USING {CARTS} AS cart '
+                f'WHERE cart.recipe_id = %s '
+                f'AND {ITEMS}.user_id = cart.user_id '
+                f'AND {ITEMS}.amount <= 0',
+                [recipe_id]
+            )
+
+
+# Expected content of the table, computed from scratch
+EXPECTED_ITEMS_SQL = (
+    f'SELECT cart.user_id, recipe_ingredient.ingredient_id, '
+    f'SUM(recipe_ingredient.amount) AS amount '
+    f'FROM {CARTS} AS cart '
+    f'JOIN {RECIPE_INGREDIENTS} AS recipe_ingredient '
+    f'ON recipe_ingredient.recipe_id = cart.recipe_id '
+    f'GROUP BY cart.user_id, recipe_ingredient.ingredient_id'
+)
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import feed, search, shopping_list
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart)
+
+User = get_user_model()
+
+# Sent by the add_ingredients command once it has inserted new ingredients
+# in bulk, without a post_save for each of them
+ingredients_loaded = Signal()
+
+
+def change_counter(model, pk: int, field: str, delta: int) -> None:
+    """
+    Atomically add delta to a denormalized counter column of one row.
+
+    The change is a single UPDATE with an F() expression, so concurrent
+    writers never overwrite each other, and it runs in the transaction of
+    the write that triggered it. The counter never drops below zero.
+
+    Parameters:
+    - model (Model): Model class that holds the counter.
+    - pk (int): Primary key of the row to update.
+    - field (str): Name of the counter field.
+    - delta (int): Value to add (negative to subtract).
+    """
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', 1)
+        shopping_list.add_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_deleting(sender, instance, **kwargs):
+    # Before the delete: when the whole recipe is being deleted, its
+    # ingredients are gone by the time post_delete is sent
+    shopping_list.remove_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'in_carts_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+        feed.publish(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        # At the commit, once the ingredients of the recipe are written
+        transaction.on_commit(
+            lambda: search.update_search_vectors([instance.id]))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        search.update_search_vectors(
+            RecipeIngredient.objects.filter(ingredient=instance)
+            .values('recipe_id'))
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleting(sender, instance, **kwargs):
+    # The recipes lose the ingredient with the cascade, their vectors are
+    # recomputed once it is committed
+    recipe_ids = list(RecipeIngredient.objects.filter(ingredient=instance)
+                      .values_list('recipe_id', flat=True))
+    if recipe_ids:
+        transaction.on_commit(
+            lambda: search.update_search_vectors(recipe_ids))
@@ -0,0 +1,30 @@
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage for files named after a hash of their content.
+
+    Saving a file under a name that is already taken means saving the same
+    content again, so the stored copy is kept and nothing is written.
+    """
+
+    def save(self, name, content, max_length=None):
+        try:
+            if name and self.exists(name):
+                return name
+            return super().save(name, content, max_length)
+        finally:
+            if hasattr(content, 'temporary_file_path'):
+                # The temporary upload has been moved into place or is a
+                # duplicate, release it
+                content.close()
+
+
+def content_addressed_storage():
+    return ContentAddressedStorage()
+
+
+def recipe_image_path(instance, filename: str) -> str:
+    """Spread the images over subdirectories named after the hash prefix."""
+    return f'recipes/images/{filename[:2]}/{filename}'
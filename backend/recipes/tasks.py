@@ -0,0 +1,18 @@
+from jobs.runner import task
+
+from . import feed
+from .images import build_image_variants
+from .models import Recipe
+
+
+@task('recipes.build_image_variants')
+def build_image_variants_task(recipe_id: int) -> None:
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    # The recipe may have been deleted in the meantime
+    if recipe is not None:
+        build_image_variants(recipe)
+
+
+@task('recipes.backfill_feed')
+def backfill_feed_task(author_id: int) -> None:
+    feed.backfill_followers(author_id)
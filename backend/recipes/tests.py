@@ -0,0 +1,123 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .models import Ingredient, Recipe, RecipeIngredient
+from .search import search_recipes
+from .signals import ingredients_loaded
+
+User = get_user_model()
+
+INGREDIENTS = [{'name': f'Ингредиент {number}', 'measurement_unit': 'г'}
+               for number in range(20)]
+
+
+class AddIngredientsTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def load(self, content: str, extension: str, *args):
+        path = self.directory / f'ingredients.{extension}'
+        path.write_text(content, encoding='utf-8')
+        call_command('add_ingredients', str(path), *args,
+                     stdout=open('/dev/null', 'w'))
+
+    def assert_invalid(self, content: str, extension: str, line: int):
+        for args in ((), ('--copy',)):
+            with self.subTest(args=args):
+                with self.assertRaisesMessage(CommandError, f'line {line}:'):
+                    self.load(content, extension, *args)
+
+    def test_json(self):
+        content = json.dumps(INGREDIENTS, ensure_ascii=False, indent=1)
+        for chunk_size in (7, 64 * 1024):
+            with mock.patch('recipes.management.commands.add_ingredients.'
+                            'INGREDIENTS_READ_CHUNK_SIZE', chunk_size):
+                self.load(content, 'json')
+        self.assertEqual(Ingredient.objects.count(), len(INGREDIENTS))
+
+    def test_csv(self):
+        self.load('name,measurement_unit\nсоль,г\n\n"перец, черный",г\n',
+                  'csv')
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    def test_loaded_signal(self):
+        receiver = mock.Mock()
+        ingredients_loaded.connect(receiver, sender=Ingredient)
+        self.addCleanup(ingredients_loaded.disconnect, receiver,
+                        sender=Ingredient)
+        for args in ((), ('--copy',)):
+            self.load('соль,г\n', 'csv', *args)
+        # Sent once: the second load adds nothing
+        receiver.assert_called_once_with(signal=ingredients_loaded,
+                                         sender=Ingredient)
+
+    def test_csv_wrong_field_count(self):
+        self.assert_invalid('соль,г\nперец\n', 'csv', 2)
+        self.assert_invalid('соль,г\n\nперец,г,шт\n', 'csv', 3)
+
+    def test_json_malformed(self):
+        lines = json.dumps(INGREDIENTS, ensure_ascii=False,
+                           indent=1).splitlines()
+        # The closing quote of the name of the 5th ingredient
+        lines[18] = lines[18].replace('",', ',')
+        for chunk_size in (7, 64 * 1024):
+            with mock.patch('recipes.management.commands.add_ingredients.'
+                            'INGREDIENTS_READ_CHUNK_SIZE', chunk_size):
+                self.assert_invalid('\n'.join(lines), 'json', 19)
+
+    def test_json_wrong_item(self):
+        self.assert_invalid('[\n {"name": "соль"}\n]', 'json', 2)
+        self.assert_invalid('[{"name": "соль", "measurement_unit": "г"},\n'
+                            ' 1]', 'json', 2)
+
+    def test_not_an_array(self):
+        self.assert_invalid('', 'json', 1)
+        self.assert_invalid('\n\n{}', 'json', 3)
+        self.assert_invalid('[{"name": "соль", "measurement_unit": "г"}',
+                            'json', 1)
+
+
+class SearchVectorTest(TestCase):
+
+    def setUp(self):
+        author = User.objects.create_user(email='author@example.com',
+                                          username='author',
+                                          first_name='author',
+                                          last_name='author',
+                                          password='password')
+        self.ingredient = Ingredient.objects.create(name='Шафран',
+                                                    measurement_unit='г')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(author=author,
+                                                name='Плов',
+                                                text='Описание',
+                                                cooking_time=60,
+                                                image='recipes/test.png')
+            RecipeIngredient.objects.create(recipe=self.recipe,
+                                            ingredient=self.ingredient,
+                                            amount=1)
+
+    def found(self, text: str) -> bool:
+        return search_recipes(Recipe.objects.all(), text).exists()
+
+    def test_ingredient_renamed(self):
+        self.assertTrue(self.found('шафран'))
+        self.ingredient.name = 'Куркума'
+        self.ingredient.save()
+        self.assertFalse(self.found('шафран'))
+        self.assertTrue(self.found('куркума'))
+
+    def test_ingredient_deleted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.delete()
+        self.assertFalse(self.found('шафран'))
+        self.assertTrue(self.found('плов'))